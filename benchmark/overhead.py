@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""Benchmark overhead of interception against the methods not intercepted
+
+Per call overhead is measured by advice, by number of advices of an advice and for the exception
+path. Weave time is measured by number of joint-points and of methods of the class. Results are
+written as JSON, which can be compared with results of an earlier release to catch regressions.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+from interceptor import Aspects, Pointcut, intercept
+
+
+ADVICES = ('before', 'around_before', 'after_exc', 'around_after', 'after_success',
+           'after_finally')
+ADVICE_COUNTS = (1, 2, 4, 8)
+JOINT_POINT_COUNTS = (1, 10, 100)
+METHOD_COUNTS = (10, 100, 1000)
+# Ratio of time of a benchmark to its earlier time beyond which it is reported as regression.
+TOLERANCE = 1.25
+
+
+def advice(*arg, **kw):  # pylint: disable=W0613
+    """Advice doing nothing"""
+
+
+def make_advice():
+    """New advice doing nothing, so that aspects made of it aren't compiled already"""
+    return lambda *arg, **kw: None
+
+
+def proceeding(join_point):
+    """Around advice just proceeding with the call"""
+    return join_point.proceed()
+
+
+def make_class(count=1):
+    """Class having the given number of methods"""
+    def method(self, num):  # pylint: disable=W0613
+        """Method doing nothing"""
+        return num
+
+    def fail(self, num):  # pylint: disable=W0613
+        """Method raising"""
+        raise ValueError(num)
+
+    attrs = dict(('method_%d' % indx, method) for indx in range(1, count))
+    attrs.update(method=method, fail=fail)
+    return type('Sample', (object,), attrs)
+
+
+class Benchmark(object):
+    """Time taken by callables, best of repeats"""
+    def __init__(self, number, repeat):
+        self.number = number
+        self.repeat = repeat
+        self.results = list()
+
+    def time(self, func, number=None):
+        """Best time in nanoseconds taken by a call of the callable"""
+        number = number or self.number
+        return min(timeit.Timer(func).repeat(self.repeat, number)) * 1e9 / number
+
+    def add(self, name, group, nanoseconds, baseline=None):
+        """Record a result along with its overhead over the baseline"""
+        result = dict(name=name, group=group, ns=round(nanoseconds, 1))
+        if baseline is not None:
+            result['overhead_ns'] = round(nanoseconds - baseline, 1)
+        self.results.append(result)
+        print("%-40s %12.1f ns%s" % (name, nanoseconds, "" if baseline is None else
+                                     " (+%.1f ns)" % (nanoseconds - baseline)))
+
+    def call(self, name, aspects, baseline, method='method'):
+        """Time call of the method of a class intercepted with the aspects"""
+        obj = intercept(aspects)(make_class())()
+        call = getattr(obj, method)
+        if method == 'fail':
+            self.add(name, 'call', self.time(lambda: raising(call)), baseline)
+        else:
+            self.add(name, 'call', self.time(lambda: call(1)), baseline)
+
+    def weave(self, name, make_aspects, count, lazy=False):
+        """Time weaving of a class of the given number of methods, with the aspects made afresh
+        for every repeat.
+        """
+        runs = [(make_aspects(), make_class(count)) for _ in range(self.repeat)]
+
+        def weave():
+            """Weave a class with its aspects"""
+            aspects, cls = runs.pop()
+            intercept(aspects, lazy=lazy)(cls)
+        best = min(timeit.Timer(weave).repeat(self.repeat, 1))
+        self.add(name, 'weave', best * 1e9)
+
+
+def raising(call):
+    """Call expecting it to raise"""
+    try:
+        call(1)
+    except ValueError:
+        pass
+
+
+def run(number, repeat):
+    """Run the benchmarks and get their results"""
+    bench = Benchmark(number, repeat)
+    obj = make_class()()
+    baseline = bench.time(lambda: obj.method(1))
+    bench.add('baseline', 'call', baseline)
+    for advice_name in ADVICES:
+        bench.call('advice:%s' % advice_name, {r'method': {advice_name: advice}}, baseline)
+    bench.call('advice:around', {r'method': dict(around=proceeding)}, baseline)
+    for count in ADVICE_COUNTS:
+        bench.call('before x%d' % count, {r'method': dict(before=(advice,) * count)}, baseline)
+    bench.call('all advices', {r'method': dict((name, advice) for name in ADVICES)}, baseline)
+    bench.call('all advices, legacy', Aspects({r'method': dict(
+        (name, advice) for name in ADVICES)}, legacy=True), baseline)
+    bench.call('pointcut not matching call', {Pointcut(r'method', when=lambda *arg: False): dict(
+        (name, advice) for name in ADVICES)}, baseline)
+
+    exc_baseline = bench.time(lambda: raising(obj.fail))
+    bench.add('exception baseline', 'call', exc_baseline)
+    bench.call('exception:after_exc', {r'fail': dict(after_exc=advice)}, exc_baseline, 'fail')
+    bench.call('exception:after_finally', {r'fail': dict(after_finally=advice)}, exc_baseline,
+               'fail')
+
+    for count in JOINT_POINT_COUNTS:
+        bench.weave('weave %d joint-points' % count, lambda: dict(
+            (r'method_%d.*' % indx, dict(before=make_advice())) for indx in range(count)), 100)
+    for count in METHOD_COUNTS:
+        bench.weave('weave %d methods' % count, lambda: {r'.*': dict(before=make_advice())},
+                    count)
+        compiled = Aspects({r'.*': dict(before=advice)})
+        bench.weave('weave %d methods compiled' % count, lambda: compiled, count)
+        bench.weave('weave %d methods lazily' % count,
+                    lambda: {r'.*': dict(before=make_advice())}, count, True)
+    return dict(python=platform.python_version(), implementation=platform.python_implementation(),
+                number=number, repeat=repeat, results=bench.results)
+
+
+def compare(results, earlier, tolerance=TOLERANCE):
+    """Get the benchmarks slower than earlier beyond tolerance, printing the comparison"""
+    before = dict((result['name'], result) for result in earlier['results'])
+    regressions = list()
+    for result in results['results']:
+        if result['name'] not in before:
+            continue
+        key = 'overhead_ns' if 'overhead_ns' in result else 'ns'
+        old, new = before[result['name']].get(key), result[key]
+        if not old or old <= 0:
+            continue
+        ratio = float(new) / old
+        print("%-40s %12.1f -> %10.1f ns  x%.2f" % (result['name'], old, new, ratio))
+        if ratio > tolerance:
+            regressions.append(result['name'])
+    return regressions
+
+
+def main():
+    """Run benchmarks, write and compare their results"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument("-n", "--number", type=int, default=100000,
+                        help="Calls timed in a repeat, defaults to %(default)s")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Repeats taking the best of, defaults to %(default)s")
+    parser.add_argument("-o", "--output", help="Filepath to write results as JSON")
+    parser.add_argument("-c", "--compare",
+                        help="Filepath of earlier results as JSON to compare against")
+    parser.add_argument("-t", "--tolerance", type=float, default=TOLERANCE,
+                        help="Ratio to earlier results beyond which a benchmark is reported as "
+                             "regression, defaults to %(default)s")
+    args = parser.parse_args()
+
+    results = run(args.number, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as fptr:
+            json.dump(results, fptr, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as fptr:
+            regressions = compare(results, json.load(fptr), args.tolerance)
+        if regressions:
+            print("Regressions: %s" % ', '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,16 @@
 """Advices for generating call graph"""
 
-# pylint: disable=W0603
-
-import inspect
 import re
 import os
+import threading
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # Python 2, and 3 before 3.7
+    ContextVar = None
 
+from example.call_graph.binary import ENTER, EXIT
 
-COUNT = -1
 DEPTH_MARKER = "|"
 ENTER_MARKER = ">"
 EXIT_MARKER = "<"
@@ -15,61 +18,88 @@ RJUST_LONG = 50
 RJUST_SMALL = 25
 
 
-def increase_depth(*arg, **kw):  # pylint: disable=W0613
+class _ThreadVar(object):
+    """Variable having a value per thread, in absence of context variables"""
+    def __init__(self, default):
+        self._local = threading.local()
+        self._default = default
+
+    def get(self):
+        """Value for the current thread"""
+        return getattr(self._local, 'value', self._default)
+
+    def set(self, value):
+        """Set value for the current thread"""
+        self._local.value = value
+
+
+# Depth in the call graph tree, per thread, and per task of asyncio if context variables exist.
+DEPTH = ContextVar('depth', default=-1) if ContextVar else _ThreadVar(-1)
+
+
+def increase_depth(join_point):  # pylint: disable=W0613
     """Increase count of marker that signifies depth in the call graph tree"""
-    global COUNT
-    COUNT += 1
+    DEPTH.set(DEPTH.get() + 1)
+
+
+def get_short(_fname):
+    """Get basename of the file. If file is __init__.py, get its directory too"""
+    dir_path, short_fname = os.path.split(_fname)
+    short_fname = short_fname.replace(".py", "")
+    if short_fname == "__init__":
+        short_fname = "%s.%s" % (os.path.basename(dir_path), short_fname)
+    return short_fname
+
+
+def get_long(_fname):
+    """Get full reference to the file"""
+    try:
+        return re.findall(r'(ansible.*)\.py', _fname)[-1].replace(os.sep, ".")
+    except IndexError:
+        # If ansible is extending some library, ansible won't be present in the path.
+        return get_short(_fname)
+
+
+def get_display(info, _long, enter):
+    """Get padded text before and after the depth in call info of the method"""
+    if not _long:
+        _fname, _rjust = get_short(info.filename), RJUST_SMALL
+    else:
+        _fname, _rjust = get_long(info.filename), RJUST_LONG
+    # Line number where method starts or ends, and method enter or exit marker
+    lineno, marker = (info.first_line, ENTER_MARKER) if enter else (info.last_line, EXIT_MARKER)
+    return "%s: %s:" % (_fname.rjust(_rjust), str(lineno).rjust(4)), marker + info.name
+
+
+def write(sink, _long, enter=True):
+    """Write the call info to the trace sink"""
+    displays = dict()  # Display of the methods by their MethodInfo, got on first call
+
+    def method(join_point):
+        """Reference to the advice in order to facilitate argument support."""
+        info = join_point.method
+        try:
+            before_depth, after_depth = displays[info]
+        except KeyError:
+            before_depth, after_depth = displays.setdefault(info, get_display(info, _long, enter))
+        sink.write("%s%s %s\n" % (
+            before_depth,                          # filename, line number
+            (" %s" % DEPTH_MARKER) * DEPTH.get(),  # Depth
+            after_depth                            # Method enter, exit marker and name
+        ))
+    return method
+
 
+def record(sink, enter=True):
+    """Write the call, by its MethodInfo and depth, to the binary trace sink"""
+    kind = ENTER if enter else EXIT
 
-def write(_filename, _long, enter=True):
-    """Write the call info to file"""
-    def method(*arg, **kw):  # pylint: disable=W0613
+    def method(join_point):
         """Reference to the advice in order to facilitate argument support."""
-        def get_short(_fname):
-            """Get basename of the file. If file is __init__.py, get its directory too"""
-            dir_path, short_fname = os.path.split(_fname)
-            short_fname = short_fname.replace(".py", "")
-            if short_fname == "__init__":
-                short_fname = "%s.%s" % (os.path.basename(dir_path), short_fname)
-            return short_fname
-
-        def get_long(_fname):
-            """Get full reference to the file"""
-            try:
-                return re.findall(r'(ansible.*)\.py', _fname)[-1].replace(os.sep, ".")
-            except IndexError:
-                # If ansible is extending some library, ansible won't be present in the path.
-                return get_short(_fname)
-
-        meth_code = arg[1].im_func.func_code
-        fname, lineno, _name = meth_code.co_filename, meth_code.co_firstlineno, meth_code.co_name
-        marker = ENTER_MARKER
-        if not _long:
-            _fname, _rjust = get_short(fname), RJUST_SMALL
-        else:
-            _fname, _rjust = get_long(fname), RJUST_LONG
-        if not enter:
-            try:
-                meth_line_count = len(inspect.getsourcelines(meth_code)[0])
-                lineno += meth_line_count - 1
-            except Exception:  # pylint: disable=W0703
-                # TODO: Find other way to get ending line number for the method
-                # Line number same as start of method.
-                pass
-            marker = EXIT_MARKER
-        with open(_filename, "a") as fptr:
-            call_info = "%s: %s:%s %s%s\n" % (
-                _fname.rjust(_rjust),            # filename
-                str(lineno).rjust(4),            # line number
-                (" %s" % DEPTH_MARKER) * COUNT,  # Depth
-                marker,                          # Method enter, exit marker
-                _name                            # Method name
-            )
-            fptr.write(call_info)
+        sink.write((join_point.method, DEPTH.get(), kind))
     return method
 
 
-def decrease_depth(*arg, **kw):  # pylint: disable=W0613
+def decrease_depth(join_point):  # pylint: disable=W0613
     """Decrease count of marker that signifies depth in the call graph tree"""
-    global COUNT
-    COUNT -= 1
+    DEPTH.set(DEPTH.get() - 1)
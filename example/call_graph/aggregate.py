@@ -0,0 +1,193 @@
+"""Call tree aggregated in memory, exported as collapsed stacks for flamegraphs and hot methods"""
+
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+
+from multiprocessing.util import Finalize, register_after_fork
+from os.path import join
+
+from example.call_graph.advices import ContextVar, _ThreadVar, get_long, get_short
+from interceptor import Aspects
+from interceptor.profiling import clock_ns
+
+
+class _Node(object):
+    """Calls of a method by a path of calls, along with the calls it makes"""
+    __slots__ = ('label', 'calls', 'total', 'children')
+
+    def __init__(self, label):
+        self.label = label
+        self.calls = 0
+        self.total = 0          # Nanoseconds of the calls, the calls they make included
+        self.children = dict()  # {MethodInfo: _Node}
+
+
+class CallTree(object):
+    """Aspect aggregating calls by their path in the call tree, instead of tracing every call.
+
+    A node is kept per distinct path of calls, with count of the calls and their cumulative time,
+    so memory is bounded by the paths rather than the calls. Paths are tracked per thread, and
+    per asyncio task on Python 3.7+, in a tree of each thread. Forked worker processes aggregate
+    calls of their own, which they write to a part file on exit, to be merged by the process
+    creating the tree.
+
+        tree = CallTree()
+        intercept(tree.aspects())(PlaybookCLI)
+        ...
+        tree.write_collapsed('call_graph.folded')
+        print(tree.format_hot())
+    """
+    def __init__(self, _long=False):
+        self._long = _long
+        self._labels = dict()  # {MethodInfo: label of the method}
+        self._owner = os.getpid()
+        self._parts = tempfile.mkdtemp(prefix='.call_tree.')
+        # Innermost call in flight as (node, start, outer call in flight), or None.
+        self._current = ContextVar('call', default=None) if ContextVar else _ThreadVar(None)
+        self._roots = list()  # Roots of the trees of the threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.advices = dict(before=self._enter, after_finally=self._exit)
+        atexit.register(self.close)
+        register_after_fork(self, CallTree._forked)
+
+    def aspects(self, joint_point=r'.*'):
+        """Aspects aggregating calls of the methods matching the joint-point"""
+        return Aspects({joint_point: self.advices})
+
+    def _label(self, info):
+        """Frame of the method in a stack, by file, class and name"""
+        _fname = get_long(info.filename) if self._long else get_short(info.filename)
+        return '%s:%s.%s' % (_fname, info.cls.__name__, info.name)
+
+    def _root(self):
+        """Root of the tree of the current thread"""
+        try:
+            return self._local.root
+        except AttributeError:
+            root = self._local.root = _Node(None)
+            with self._lock:
+                self._roots.append(root)
+            return root
+
+    def _enter(self, join_point):
+        """Push the call on the path, under the call it is made by"""
+        current = self._current.get()
+        parent = self._root() if current is None else current[0]
+        info = join_point.method
+        try:
+            node = parent.children[info]
+        except KeyError:
+            try:
+                label = self._labels[info]
+            except KeyError:
+                label = self._labels.setdefault(info, self._label(info))
+            node = parent.children.setdefault(info, _Node(label))
+        self._current.set((node, clock_ns(), current))
+
+    def _exit(self, join_point):  # pylint: disable=W0613
+        """Pop the call off the path, counting it along with its time"""
+        end = clock_ns()
+        node, start, outer = self._current.get()
+        node.calls += 1
+        node.total += end - start
+        self._current.set(outer)
+
+    def _forked(self):
+        """Forget calls of the process forking, in a forked worker, and dump calls on its exit.
+
+        Nodes are zeroed rather than dropped, so that calls of the worker are aggregated under
+        the path the worker is forked from.
+        """
+        nodes = list(self._roots)
+        while nodes:
+            node = nodes.pop()
+            node.calls = node.total = 0
+            nodes.extend(node.children.values())
+        self._lock = threading.Lock()
+        # Forked workers of multiprocessing exit without running atexit handlers.
+        Finalize(self, CallTree._dump, args=(self,), exitpriority=10)
+
+    def rows(self):
+        """Calls, cumulative and self nanoseconds by path of labels, of every process"""
+        rows = dict()
+        stack = [((), root) for root in self._roots]
+        while stack:
+            path, node = stack.pop()
+            children = list(node.children.values())
+            if node.label is not None:
+                path += (node.label,)
+                if node.calls:
+                    own = node.total - sum(child.total for child in children)
+                    _add(rows, path, (node.calls, node.total, max(own, 0)))
+            stack.extend((path, child) for child in children)
+        if os.getpid() == self._owner and os.path.isdir(self._parts):
+            for name in os.listdir(self._parts):
+                if name.endswith('.tmp'):
+                    continue  # Part of a worker still writing it
+                with open(join(self._parts, name)) as fptr:
+                    for line in fptr:
+                        calls, total, own, path = line.rstrip('\n').split('\t', 3)
+                        _add(rows, tuple(path.split(';')), (int(calls), int(total), int(own)))
+        return rows
+
+    def _dump(self):
+        """Write calls of a forked worker to its part file, for the process creating the tree"""
+        if os.getpid() == self._owner or not os.path.isdir(self._parts):
+            return
+        rows = self.rows()
+        if not rows:
+            return
+        name = join(self._parts, str(os.getpid()))
+        with open(name + '.tmp', 'w') as fptr:
+            for path, (calls, total, own) in rows.items():
+                fptr.write('%d\t%d\t%d\t%s\n' % (calls, total, own, ';'.join(path)))
+        os.rename(name + '.tmp', name)
+
+    def collapsed(self):
+        """Lines of collapsed stacks, by self time in microseconds, for flamegraph.pl and alike"""
+        return ['%s %d' % (';'.join(path), own // 1000)
+                for path, (_, _, own) in sorted(self.rows().items()) if own >= 1000]
+
+    def hot_methods(self):
+        """Calls, cumulative and self nanoseconds per method, by self time, highest first.
+
+        Cumulative time of recursive calls is counted for the outermost call only.
+        """
+        methods = dict()
+        for path, (calls, total, own) in self.rows().items():
+            _add(methods, path[-1], (calls, 0 if path[-1] in path[:-1] else total, own))
+        return sorted(((label, ) + tuple(stats) for label, stats in methods.items()),
+                      key=lambda row: row[3], reverse=True)
+
+    def format_hot(self, limit=30):
+        """Table of the hottest methods"""
+        lines = ['%10s %12s %12s  %s' % ('calls', 'total ms', 'self ms', 'method')]
+        for label, calls, total, own in self.hot_methods()[:limit]:
+            lines.append('%10d %12.3f %12.3f  %s' % (calls, total / 1e6, own / 1e6, label))
+        return '\n'.join(lines)
+
+    def write_collapsed(self, filename):
+        """Write collapsed stacks to the file"""
+        with open(filename, 'w') as fptr:
+            for line in self.collapsed():
+                fptr.write(line + '\n')
+
+    def close(self):
+        """Remove part files of the workers, once exported"""
+        if os.getpid() == self._owner:
+            shutil.rmtree(self._parts, ignore_errors=True)
+
+
+def _add(rows, key, stats):
+    """Add the stats to the row of the key"""
+    try:
+        row = rows[key]
+    except KeyError:
+        rows[key] = list(stats)
+        return
+    for indx, value in enumerate(stats):
+        row[indx] += value
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""Analyze binary call graph trace, in chunks of a memory map of it processed in parallel
+
+Renders the trace as the text call graph, and gets calls and time per method along with the
+histogram of call depths.
+"""
+
+from __future__ import print_function
+
+import argparse
+import mmap
+import sys
+
+from collections import namedtuple
+from multiprocessing import Pool
+
+from example.call_graph.advices import DEPTH_MARKER, get_display
+from example.call_graph.binary import ENTER, RECORD, read_header
+
+CHUNK = 1 << 20  # Records analyzed by a task
+Method = namedtuple('Method', 'filename first_line last_line name')
+
+_TRACE = None  # Trace opened by the process, along with the options
+
+
+class _Trace(object):
+    """Memory map of the trace along with its header, and display of the methods got once"""
+    def __init__(self, filename, _long=False, tree=False):
+        with open(filename, 'rb') as fptr:
+            self.buf = mmap.mmap(fptr.fileno(), 0, access=mmap.ACCESS_READ)
+        methods, self.labels, self.offset, self.count = read_header(self.buf)
+        self.methods = [Method(*method) for method in methods]
+        self.tree = tree
+        self.displays = [(get_display(method, _long, True), get_display(method, _long, False))
+                         for method in self.methods] if tree else None
+
+    def records(self, start, stop):
+        """Records from the start up to the stop"""
+        begin, end = self.offset + start * RECORD.size, self.offset + stop * RECORD.size
+        if hasattr(RECORD, 'iter_unpack'):
+            return RECORD.iter_unpack(self.buf[begin:end])
+        return (RECORD.unpack_from(self.buf, offset)  # Python 2
+                for offset in range(begin, end, RECORD.size))
+
+    def line(self, method, stream, depth, kind):
+        """Line of the record in the text call graph, prefixed by its stream if many"""
+        before_depth, after_depth = self.displays[method][kind]
+        line = "%s%s %s\n" % (before_depth, (" %s" % DEPTH_MARKER) * depth, after_depth)
+        return '[%s] %s' % (self.labels[stream], line) if len(self.labels) > 1 else line
+
+
+class _Stats(object):
+    """Calls, time and longest call per method id and histogram of the depths, of a chunk or of
+    the chunks so far, along with starts of the calls left open per stream.
+    """
+    def __init__(self, methods):
+        self.calls = [0] * methods
+        self.time, self.longest = dict(), dict()
+        self.depths = dict()
+        self.opened = dict()  # {stream: starts of the calls open}
+
+    def enter(self, method, stream, depth, stamp):
+        """Count the call, opened till its exit"""
+        self.calls[method] += 1
+        self.depths[depth] = self.depths.get(depth, 0) + 1
+        self.opened.setdefault(stream, list()).append(stamp)
+
+    def exit(self, method, stream, stamp):
+        """Time the call by the start of the last call open of the stream, if there is one, and
+        whether there is.
+        """
+        stack = self.opened.get(stream)
+        if not stack:
+            return False
+        elapsed = stamp - stack.pop()
+        self.time[method] = self.time.get(method, 0) + elapsed
+        self.longest[method] = max(self.longest.get(method, 0), elapsed)
+        return True
+
+    def combine(self, stats, unpaired):
+        """Add stats of the chunk following, pairing the exits it has no enter for with the calls
+        left open.
+        """
+        for method, count in enumerate(stats.calls):
+            self.calls[method] += count
+        for method, elapsed in stats.time.items():
+            self.time[method] = self.time.get(method, 0) + elapsed
+            self.longest[method] = max(self.longest.get(method, 0), stats.longest[method])
+        for depth, count in stats.depths.items():
+            self.depths[depth] = self.depths.get(depth, 0) + count
+        for stream, exits in unpaired.items():
+            for method, stamp in exits:
+                self.exit(method, stream, stamp)
+        for stream, starts in stats.opened.items():
+            self.opened.setdefault(stream, list()).extend(starts)
+
+    def by_method(self, methods):
+        """Stats as {Method: (calls, seconds, longest call)} of the methods called"""
+        return dict((method, (self.calls[indx], self.time.get(indx, 0), self.longest.get(indx, 0)))
+                    for indx, method in enumerate(methods) if self.calls[indx])
+
+
+def _open(filename, _long, tree):
+    """Open the trace in a worker process"""
+    global _TRACE  # pylint: disable=W0603
+    _TRACE = _Trace(filename, _long, tree)
+
+
+def _analyze(chunk):
+    """Analyze records of the chunk, given as start and stop.
+
+    Calls are timed by pairing enter and exit of a stream in the chunk. Enter left open at the end
+    and exits having no enter at the start, per stream, are handed over to be paired across the
+    chunks.
+    """
+    trace = _TRACE
+    stats, unpaired, lines = _Stats(len(trace.methods)), dict(), list()
+    for stamp, method, stream, depth, kind in trace.records(*chunk):
+        if trace.tree:
+            lines.append(trace.line(method, stream, depth, kind))
+        if kind == ENTER:
+            stats.enter(method, stream, depth, stamp)
+        elif not stats.exit(method, stream, stamp):
+            unpaired.setdefault(stream, list()).append((method, stamp))
+    return dict(tree=''.join(lines), stats=stats, unpaired=unpaired)
+
+
+def analyze(filename, tree=None, _long=False, jobs=None, chunk=CHUNK):
+    """Stats as {Method: (calls, seconds, longest call)} and histogram of the depths of the calls
+    as {depth: calls}, of the trace, writing the text call graph to tree if given.
+
+    Chunks of chunk records are analyzed by jobs processes, as many as the CPUs by default, and
+    their results combined in order of the chunks.
+    """
+    _open(filename, _long, tree is not None)
+    trace = _TRACE
+    chunks = [(start, min(start + chunk, trace.count)) for start in range(0, trace.count, chunk)]
+    pool = None
+    if jobs != 1 and len(chunks) > 1:
+        pool = Pool(jobs, _open, (filename, _long, tree is not None))
+        results = pool.imap(_analyze, chunks)
+    else:
+        results = (_analyze(item) for item in chunks)
+    stats = _Stats(len(trace.methods))
+    try:
+        for result in results:
+            if tree is not None:
+                tree.write(result['tree'])
+            stats.combine(result['stats'], result['unpaired'])
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return stats.by_method(trace.methods), stats.depths
+
+
+def format_stats(stats, limit=None):
+    """Table of the methods by time, highest first"""
+    lines = ['%10s %12s %12s %12s  %s' % ('calls', 'total ms', 'mean us', 'max ms', 'method')]
+    for method, (calls, seconds, longest) in sorted(
+            stats.items(), key=lambda item: item[1][1], reverse=True)[:limit]:
+        lines.append('%10d %12.3f %12.3f %12.3f  %s:%d %s' % (
+            calls, seconds * 1e3, seconds * 1e6 / calls, longest * 1e3, method.filename,
+            method.first_line, method.name))
+    return '\n'.join(lines)
+
+
+def format_depths(depths, width=50):
+    """Histogram of the depths of the calls"""
+    most = max(depths.values()) if depths else 0
+    return '\n'.join('%5d %12d %s' % (depth, count, '#' * (count * width // most))
+                     for depth, count in sorted(depths.items()))
+
+
+def main():
+    """Analyze the trace given"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument("trace", help="Filepath of the binary call graph trace")
+    parser.add_argument("-t", "--tree",
+                        help="Filepath to write the text call graph to, - for standard output")
+    parser.add_argument("-l", "--long", action='store_true', default=False,
+                        help="File reference of method in call graph is absolute, i.e. starts "
+                             "with ansible, otherwise just the basename if not __init__.py")
+    parser.add_argument("-n", "--top", type=int, default=30,
+                        help="Methods listed by time, defaults to %(default)s")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="Processes analyzing the chunks, defaults to the CPUs")
+    parser.add_argument("-c", "--chunk", type=int, default=CHUNK,
+                        help="Records analyzed by a task, defaults to %(default)s")
+    args = parser.parse_args()
+
+    tree = None
+    if args.tree == '-':
+        tree = sys.stdout
+    elif args.tree:
+        tree = open(args.tree, 'w')
+    try:
+        stats, depths = analyze(args.trace, tree, args.long, args.jobs, args.chunk)
+    finally:
+        if tree not in (None, sys.stdout):
+            tree.close()
+    print(format_stats(stats, args.top))
+    print()
+    print(format_depths(depths))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Compact binary call graph trace, having a table of the methods and records of fixed width
+
+A trace starts with the header, followed by the methods, the streams and then the records:
+
+    header   magic 'ICG1', count of methods, of streams and of records  <4sIIQ
+    method   length and text of 'filename<tab>first line<tab>last line<tab>name' <I + text
+    stream   length and label of the thread, 'pid:thread name'             <I + text
+    record   time, method, stream, depth and kind, enter 0 or exit 1     <dIIhB
+"""
+
+import os
+import shutil
+import struct
+
+from os.path import join
+
+from example.call_graph.sink import TraceSink
+
+MAGIC = b'ICG1'
+HEADER = struct.Struct('<4sIIQ')
+RECORD = struct.Struct('<dIIhB')
+ENTER, EXIT = 0, 1
+# Record of a part file, by the ids of the methods in the process writing it.
+_PART_RECORD = struct.Struct('<dIhB')
+_LENGTH = struct.Struct('<I')
+
+
+def _pack_str(text):
+    """Text prefixed by its length"""
+    data = text.encode('utf-8')
+    return _LENGTH.pack(len(data)) + data
+
+
+def _unpack_str(buf, offset):
+    """Text prefixed by its length at the offset, and the offset after it"""
+    length, = _LENGTH.unpack_from(buf, offset)
+    offset += _LENGTH.size
+    return buf[offset:offset + length].decode('utf-8'), offset + length
+
+
+def _read_chunks(fptr, size):
+    """Chunks of the size read from the file till its end, ignoring a partial one"""
+    while True:
+        data = fptr.read(size)
+        if len(data) < size:
+            return
+        yield data
+
+
+def read_header(buf):
+    """Methods as (filename, first line, last line, name), labels of the streams, offset of the
+    records and their count, of the trace in the buffer.
+    """
+    magic, methods, streams, count = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a binary call graph trace")
+    offset, texts = HEADER.size, list()
+    for _ in range(methods + streams):
+        text, offset = _unpack_str(buf, offset)
+        texts.append(text)
+    methods = [(filename, int(first), int(last), name) for filename, first, last, name in
+               (text.split('\t') for text in texts[:methods])]
+    return methods, texts[len(methods):], offset, count
+
+
+class BinaryTraceSink(TraceSink):
+    """Trace sink writing records of (MethodInfo, depth, kind) in the binary format.
+
+    Methods are given ids as their records are written, by the background thread, and appended to
+    the table of methods of the process, so that forked workers have ids of their own. The parts
+    are merged into one table of methods and records ordered by time.
+    """
+    def _init(self):
+        self._ids = dict()  # {MethodInfo: id of the method in the process}
+        self._table = None  # File of the methods of the process
+        super(BinaryTraceSink, self)._init()
+
+    def _open_part(self, index, label):
+        """Part file of the stream, starting with its label"""
+        fptr = open(join(self._parts, '%s.%d' % (self._process, index)), 'wb')
+        fptr.write(_pack_str(label))
+        return fptr
+
+    def _method_id(self, info):
+        """Id of the method, written to the table of methods of the process on first record"""
+        try:
+            return self._ids[info]
+        except KeyError:
+            if self._table is None:
+                self._table = open(join(self._parts, '%s.methods' % self._process), 'wb')
+                self._files['methods'] = self._table  # Closed along with the parts
+            self._table.write(_pack_str('\t'.join((
+                info.filename, str(info.first_line), str(info.last_line), info.name))))
+            self._table.flush()
+            return self._ids.setdefault(info, len(self._ids))
+
+    def _encode(self, items):
+        """Packed records along with their time, by the ids of the methods"""
+        method_id, pack = self._method_id, _PART_RECORD.pack
+        return b''.join([pack(stamp, method_id(info), depth, kind)
+                         for stamp, (info, depth, kind) in items])
+
+    def _merge(self):
+        """Write the methods, streams and records of all the parts ordered by time to the file"""
+        try:
+            names = os.listdir(self._parts)
+            tables = [name for name in names if name.endswith('.methods')]
+            methods, ids = self._read_methods(tables)
+            parts = sorted(set(names) - set(tables))
+            labels = list()
+            for name in parts:
+                with open(join(self._parts, name), 'rb') as fptr:
+                    length, = _LENGTH.unpack(fptr.read(_LENGTH.size))
+                    labels.append(fptr.read(length).decode('utf-8'))
+            with open(self.filename, 'wb') as target:
+                target.write(HEADER.pack(MAGIC, len(methods), len(labels), 0))
+                for text in methods + labels:
+                    target.write(_pack_str(text))
+                count = 0
+                for _, _, _, record in self._merged([
+                        self._read_part(stream, name, ids) for stream, name in enumerate(parts)]):
+                    target.write(record)
+                    count += 1
+                target.seek(0)
+                target.write(HEADER.pack(MAGIC, len(methods), len(labels), count))
+        finally:
+            shutil.rmtree(self._parts)
+
+    def _read_methods(self, names):
+        """Methods of the tables of the processes, and their ids in the trace by (process, id in
+        the process), as methods are shared by the processes.
+        """
+        methods, ids = list(), dict()
+        known = dict()  # {method: id in the trace}
+        for name in names:
+            process = name.split('.')[0]
+            with open(join(self._parts, name), 'rb') as fptr:
+                data, offset, method = fptr.read(), 0, 0
+            while offset < len(data):
+                text, offset = _unpack_str(data, offset)
+                if text not in known:
+                    known[text] = len(methods)
+                    methods.append(text)
+                ids[process, method] = known[text]
+                method += 1
+        return methods, ids
+
+    def _read_part(self, index, name, ids):  # pylint: disable=W0221
+        """Time, stream, order in the stream and record of the records in a part file, by ids of
+        the methods in the trace.
+        """
+        process = name.split('.')[0]
+        with open(join(self._parts, name), 'rb') as fptr:
+            length, = _LENGTH.unpack(fptr.read(_LENGTH.size))
+            fptr.read(length)
+            for order, data in enumerate(_read_chunks(fptr, _PART_RECORD.size)):
+                stamp, method, depth, kind = _PART_RECORD.unpack(data)
+                yield stamp, index, order, RECORD.pack(
+                    stamp, ids[process, method], index, depth, kind)
+
+    def _write_run(self, name, records):
+        """Write the records merged to the run file"""
+        with open(name, 'wb') as fptr:
+            for _, _, _, record in records:
+                fptr.write(record)
+
+    def _read_run(self, index, name):
+        """Time, run, order in the run and record of the records in a run file"""
+        with open(name, 'rb') as fptr:
+            for order, data in enumerate(_read_chunks(fptr, RECORD.size)):
+                yield RECORD.unpack_from(data)[0], index, order, data
@@ -8,50 +8,28 @@ https://github.com/sans-sense/Utils
 # pylint: disable=C0103
 
 import argparse
-import inspect
 import sys
 
 from ansible.cli.playbook import PlaybookCLI  # pylint: disable=E0611,F0401
-from collections import OrderedDict
 from os.path import abspath, dirname, exists, join
 
-from example.call_graph.advices import decrease_depth, increase_depth, write
+from example.call_graph.advices import decrease_depth, increase_depth, record, write
+from example.call_graph.aggregate import CallTree
+from example.call_graph.binary import BinaryTraceSink
+from example.call_graph.sink import TraceSink
 from example.call_graph.utils import suppressConsoleOut
-from interceptor import intercept
+from interceptor import Aspects
+from interceptor.importhook import stop_weaving_on_import, weave_on_import
 
 
-ANSIBLE_CLASSES = OrderedDict()  # Add class in the order they are used.
+ANSIBLE_MODULES = r'ansible(\.|$)'  # Modules the classes of which are woven
 DESCRIPTION = ("The tool generates the call graph when a playbook is run after ansible classes "
                "are intercepted")
 IGNORE_METHODS = ["_process_pending_results", "_read_worker_result", "_wait_on_pending_results"]
 TARGET_FILE = join(dirname(__file__), "call_graph.txt")
-
-
-def collect_ansible_classes():
-    """Run playbook and collect classes of ansible that are run."""
-    def trace_calls(frame, event, arg):  # pylint: disable=W0613
-        """Trace function calls to collect ansible classes.
-
-        Trace functions and check if they have self as an arg. If so, get their class if the
-        class belongs to ansible.
-        """
-        if event != 'call':
-            return
-        try:
-            _locals = inspect.getargvalues(frame).locals
-            if 'self' not in _locals:
-                return
-            _class = _locals['self'].__class__
-            _class_repr = repr(_class)
-            if 'ansible' not in _class_repr:
-                return
-            ANSIBLE_CLASSES[_class] = True
-        except (AttributeError, TypeError):
-            pass
-
-    print "Gathering classes"
-    sys.settrace(trace_calls)
-    main()
+FOLDED_FILE = join(dirname(__file__), "call_graph.folded")
+BINARY_FILE = join(dirname(__file__), "call_graph.bin")
+HOT_METHODS = 30  # Methods listed in the table of the hottest methods
 
 
 @suppressConsoleOut
@@ -127,8 +105,16 @@ def _parse_args():
         help="File reference of method in call graph is absolute, i.e. starts with ansible, "
              "otherwise just the basename if not __init__.py")
     parser.add_argument(
-        "-t", "--target", nargs="?", type=validate, const=TARGET_FILE, default=TARGET_FILE,
-        help="Filepath to write call graph, defaults to %(default)s")
+        "-t", "--target", nargs="?", type=validate,
+        help="Filepath to write call graph, defaults to %s, %s if aggregated or %s if "
+             "binary" % (TARGET_FILE, FOLDED_FILE, BINARY_FILE))
+    parser.add_argument(
+        "-a", "--aggregate", action='store_true', default=False,
+        help="Aggregate calls in a call tree in memory, writing collapsed stacks for flamegraphs "
+             "to the target and printing the hottest methods, instead of tracing every call")
+    parser.add_argument(
+        "-b", "--binary", action='store_true', default=False,
+        help="Write the trace in the compact binary format, to be analyzed by analyze.py")
     parser.add_argument(
         "-i", "--ignore", nargs='*', action=AssignDefaultIgnore,
         help="Methods to ignore while generating call graph")
@@ -136,6 +122,9 @@ def _parse_args():
     parser.usage = \
         parser.format_usage()[len("usage: "):].rstrip() + " -- <ansible-playbook options>\n"
     cg_args = parser.parse_args(cg_args)
+    if cg_args.target is None:
+        cg_args.target = (FOLDED_FILE if cg_args.aggregate else
+                          BINARY_FILE if cg_args.binary else TARGET_FILE)
 
     if not len(sys.argv[1:]):
         parser.print_help()
@@ -144,27 +133,53 @@ def _parse_args():
     return cg_args
 
 
+def run(aspects):
+    """Run playbook while intercepting ansible classes as their modules are imported.
+
+    Classes are woven before their first call, in the playbook process, and so in the workers
+    forked from it. Modules imported by a worker are woven in the worker.
+    """
+    print "Running while intercepting ansible classes as they are imported"
+    weave_on_import(ANSIBLE_MODULES, aspects)
+    # For a small run, instead: intercept(aspects)(PlaybookCLI)
+    try:
+        main()
+    finally:
+        stop_weaving_on_import()
+
+
 if __name__ == '__main__':
     cg_args = _parse_args()
-    collect_ansible_classes()
-    # Uncomment below for small run and comment above.
-    # ANSIBLE_CLASSES[PlaybookCLI] = True
-    # Start from scratch
-    with open(cg_args.target, 'w') as fptr:
-        fptr.write('')
     pat = r'.*'
     if cg_args.ignore:
         pat = r'^(?!%s)' % '|'.join(item + '$' for item in cg_args.ignore) + pat
-    ASPECTS = {
+    if cg_args.aggregate:
+        # Calls are aggregated by path in memory, bounded by the distinct paths, and exported
+        # once the run ends, even if it fails.
+        TREE = CallTree(cg_args.long)
+        try:
+            run(TREE.aspects(pat))
+        finally:
+            TREE.write_collapsed(cg_args.target)
+            print TREE.format_hot(HOT_METHODS)
+            TREE.close()
+        sys.exit()
+    # Trace is buffered per thread and written in batches, by a background thread, instead of
+    # per call. Traces of the threads and forked workers are merged by time into the target.
+    if cg_args.binary:
+        # Records are packed by the background thread, instead of formatting lines per call.
+        SINK = BinaryTraceSink(cg_args.target)
+        enter, leave = record(SINK), record(SINK, False)
+    else:
+        SINK = TraceSink(cg_args.target)
+        enter, leave = write(SINK, cg_args.long), write(SINK, cg_args.long, False)
+    # Compiled once to share matching of method names across the classes.
+    ASPECTS = Aspects({
         pat:
             dict(
-                before=(increase_depth, write(cg_args.target, cg_args.long)),
-                after_finally=(write(cg_args.target, cg_args.long, False), decrease_depth)
+                before=(increase_depth, enter),
+                after_finally=(leave, decrease_depth)
             ),
-    }
-    print "Intercepting ansible classes"
-    for _class in ANSIBLE_CLASSES:
-        intercept(ASPECTS)(_class)
-
-    print "Running after intercepting"
-    main()
+    })
+    with SINK:  # Write the trace buffered even if the run fails.
+        run(ASPECTS)
@@ -0,0 +1,175 @@
+"""Buffered sink for the call graph trace, written to file by a background thread"""
+
+import atexit
+import binascii
+import heapq
+import os
+import shutil
+import tempfile
+import threading
+
+from collections import deque
+from multiprocessing.util import Finalize, register_after_fork
+from os.path import abspath, basename, dirname, join
+from time import time
+
+
+class TraceSink(object):
+    """Own the trace file, buffering records in memory and writing them in batches.
+
+    Records are buffered per thread, along with their time. A background thread writes the
+    records buffered every interval seconds, or as soon as max_buffered of a thread are waiting,
+    to a part file of the thread. Forked worker processes do the same for their threads. Once
+    the sink is closed by the process creating it, on interpreter exit, or on exit from the sink
+    used as a context manager, exception or not, the parts are merged by time into the file.
+    Records are prefixed with process id and thread name when there are more threads than one.
+    """
+    max_open = 64  # Files open at once while merging the parts
+
+    def __init__(self, filename, max_buffered=4096, interval=0.5):
+        self.filename = filename
+        self.max_buffered = max_buffered
+        self.interval = interval
+        self._owner = os.getpid()
+        self._parts = tempfile.mkdtemp(prefix='.%s.' % basename(filename),
+                                       dir=dirname(abspath(filename)))
+        self._init()
+        atexit.register(self.close)
+        register_after_fork(self, TraceSink._init)
+
+    def _init(self):
+        """Start writing, in the process or a forked worker of it"""
+        self._streams = list()  # [(label, buffer)] of the threads, in order of first record
+        self._files = dict()  # {index of the stream: part file}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        # Pids of exited workers are reused by the ones forked later, so parts are named by the
+        # process along with a random suffix, not to overwrite the parts of an earlier worker.
+        self._process = '%d-%s' % (os.getpid(), binascii.hexlify(os.urandom(4)).decode('ascii'))
+        self._thread = threading.Thread(target=self._run, name='trace-sink')
+        self._thread.daemon = True
+        self._thread.start()
+        # Forked workers of multiprocessing exit without running atexit handlers.
+        Finalize(self, TraceSink.close, args=(self,), exitpriority=10)
+
+    def _run(self):
+        """Write records buffered till the sink is closed"""
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def _stream(self):
+        """Buffer of the current thread, registered to be written to a part file of its own"""
+        buffer = deque()
+        with self._lock:
+            self._streams.append(
+                ('%d:%s' % (os.getpid(), threading.current_thread().name), buffer))
+        self._local.buffer = buffer
+        return buffer
+
+    def write(self, record):
+        """Buffer the record, a line of trace"""
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._stream()
+        buffer.append((time(), record))
+        if len(buffer) >= self.max_buffered:
+            self._wake.set()
+
+    def flush(self):
+        """Write records buffered to the part files"""
+        with self._lock:
+            for index, (label, buffer) in enumerate(self._streams):
+                if not buffer:
+                    continue
+                try:
+                    fptr = self._files[index]
+                except KeyError:
+                    fptr = self._files[index] = self._open_part(index, label)
+                fptr.write(self._encode([buffer.popleft() for _ in range(len(buffer))]))
+                fptr.flush()
+
+    def _open_part(self, index, label):
+        """Part file of the stream, starting with its label"""
+        fptr = open(join(self._parts, '%s.%d' % (self._process, index)), 'w')
+        fptr.write(label + '\n')
+        return fptr
+
+    def _encode(self, items):
+        """Data of the records buffered, along with their time, for the part file"""
+        return ''.join(['%.6f\t%s' % item for item in items])
+
+    def close(self):
+        """Write records buffered, and merge the parts into the file in the process creating it"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        with self._lock:
+            for fptr in self._files.values():
+                fptr.close()
+            self._files.clear()
+        if os.getpid() == self._owner:
+            self._merge()
+
+    def _merge(self):
+        """Write records of all the threads of all the processes to the file, in order of time"""
+        try:
+            names = sorted(os.listdir(self._parts))
+            prefix = len(names) > 1
+            with open(self.filename, 'w') as target:
+                for _, _, _, record in self._merged([
+                        self._read_part(index, name, prefix) for index, name in enumerate(names)]):
+                    target.write(record)
+        finally:
+            shutil.rmtree(self._parts)
+
+    def _merged(self, sources):
+        """Records of the sources merged by time. While there are more sources than max_open,
+        they are merged max_open at a time into runs, so that the files open at once are bounded
+        however many threads and workers wrote parts.
+        """
+        runs = 0
+        while len(sources) > self.max_open:
+            merged = list()
+            for start in range(0, len(sources), self.max_open):
+                name = join(self._parts, '.run.%d' % runs)
+                runs += 1
+                self._write_run(name, heapq.merge(*sources[start:start + self.max_open]))
+                merged.append(self._read_run(len(merged), name))
+            sources = merged
+        return heapq.merge(*sources)
+
+    def _read_part(self, index, name, prefix):
+        """Time, stream, order in the stream and line of the records in a part file"""
+        with open(join(self._parts, name)) as fptr:
+            label = fptr.readline().rstrip('\n')
+            for order, line in enumerate(fptr):
+                stamp, record = line.split('\t', 1)
+                yield float(stamp), index, order, '[%s] %s' % (label, record) if prefix else record
+
+    def _write_run(self, name, records):
+        """Write the records merged to the run file, along with their time"""
+        with open(name, 'w') as fptr:
+            for stamp, _, _, record in records:
+                fptr.write('%r\t%s' % (stamp, record))
+
+    def _read_run(self, index, name):
+        """Time, run, order in the run and line of the records in a run file"""
+        with open(name) as fptr:
+            for order, line in enumerate(fptr):
+                stamp, record = line.split('\t', 1)
+                yield float(stamp), index, order, record
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -2,29 +2,63 @@
 
 from multiprocessing import Queue
 
+try:
+    from multiprocessing import SimpleQueue
+except ImportError:
+    from multiprocessing.queues import SimpleQueue  # Python 2
+
+try:
+    from Queue import Empty
+except ImportError:
+    from queue import Empty  # pylint: disable=F0401
+
 
 class CompositeQueue(object):
-    """Queue to store interceptor data without intervening ansible workflow"""
+    """Queue to store interceptor data without intervening ansible workflow.
+
+    Interceptor data is sent over a queue of its own, as ansible and interceptor data are read by
+    different processes. It is a SimpleQueue, a pipe without a feeder thread, created along with
+    the ansible queue in the process building them so that the workers share it. Interceptor data
+    is put and got by the "interceptor" kwarg. Other attributes are the ones of the ansible queue,
+    looked up once.
+    """
     def __init__(self, *args, **kwargs):
-        """Initialise a queue referring to the ansible or the interceptor queue conditionally"""
-        self.interceptor_q = Queue(*args, **kwargs)
+        """Initialise the ansible queue and the interceptor queue"""
         self.ansible_q = Queue(*args, **kwargs)
+        self.interceptor_q = SimpleQueue()
+
+    def __getstate__(self):
+        """Queues only, as attributes are looked up anew"""
+        return self.ansible_q, self.interceptor_q
+
+    def __setstate__(self, state):
+        self.ansible_q, self.interceptor_q = state
 
     def __getattr__(self, item):
-        """Separate method calls for ansible and interceptor queues."""
-        def meth(*args, **kw):
-            """Get method corresponding to the right queue, based on the "interceptor" kwarg"""
-            def get_instance_attr(obj):
-                """common operation for either queue"""
-                attr = getattr(obj, item)
-                if callable(attr):
-                    return attr(*args, **kw)
-                return attr
-
-            if kw.get('interceptor', False):
-                # Remove the unknown kwarg for multiprocess
-                del kw['interceptor']
-                return get_instance_attr(self.interceptor_q)
-            else:
-                return get_instance_attr(self.ansible_q)
-        return meth
+        """Attribute of the ansible queue, set to the instance so that it isn't looked up again"""
+        if item == 'ansible_q':  # Not set yet
+            raise AttributeError(item)
+        attr = getattr(self.ansible_q, item)
+        setattr(self, item, attr)
+        return attr
+
+    def put(self, obj, block=True, timeout=None, interceptor=False):
+        """Put ansible data, or interceptor data if so asked"""
+        if interceptor:
+            self.interceptor_q.put(obj)
+        else:
+            self.ansible_q.put(obj, block, timeout)
+
+    def get(self, block=True, timeout=None, interceptor=False):
+        """Get ansible data, or interceptor data if so asked. Interceptor data isn't waited for
+        with a timeout, Empty is raised right away if there is none.
+        """
+        if not interceptor:
+            return self.ansible_q.get(block, timeout)
+        if (not block or timeout is not None) and self.interceptor_q.empty():
+            raise Empty
+        return self.interceptor_q.get()
+
+    def empty(self, interceptor=False):
+        """Whether there is no ansible data, or interceptor data if so asked"""
+        return (self.interceptor_q if interceptor else self.ansible_q).empty()
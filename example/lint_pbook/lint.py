@@ -4,7 +4,6 @@
 
 # TODO: Add tests.
 
-import inspect
 import multiprocessing
 import os
 import sys
@@ -16,7 +15,7 @@ from ansible.executor.process.worker import WorkerProcess  # pylint: disable=E06
 from collections import defaultdict
 from Queue import Empty
 
-from interceptor import intercept
+from interceptor import Aspects, Pointcut, current_join_point, intercept
 from example.lint_pbook.composite_queue import CompositeQueue
 # Override multiprocess Queue with Composite Queue.
 multiprocessing.Queue = CompositeQueue
@@ -25,12 +24,6 @@ ANSIBLE_CLASSES = (AnsibleUndefinedVariable, StrategyBase, WorkerProcess)
 # Dictionary of task, set of its exceptions
 RESULT = defaultdict(set)
 
-# Interceptor internal method names to be skipped while backtracking through call stack.
-INTERCEPTOR_INTERNAL_METHODS = {'run_advices', 'trivial'}
-# Composite queue internal method names to be skipped for while backtracking through call stack.
-COMPOSITE_QUEUE_INTERNAL_METHODS = {'meth', 'get_instance_attr'}
-SKIP_METHODS = INTERCEPTOR_INTERNAL_METHODS.union(COMPOSITE_QUEUE_INTERNAL_METHODS)
-
 
 def main():
     """Run playbook"""
@@ -42,37 +35,21 @@ def main():
     obj.run()
 
 
-def queue_exc(*arg, **kw):
+def queue_exc(join_point):
     """Queue undefined variable exception"""
-    _self = arg[0]
-    if not isinstance(_self, AnsibleUndefinedVariable):
-        # Run for AnsibleUndefinedVariable instance
-        return
-    _rslt_q = None
-    for stack_trace in inspect.stack():
-        # Check if method to be skipped
-        if stack_trace[3] in SKIP_METHODS:
-            continue
-        _frame = stack_trace[0]
-        _locals = inspect.getargvalues(_frame).locals
-        if 'self' not in _locals:
-            continue
-        # Check if current frame instance of worker
-        if isinstance(_locals['self'], WorkerProcess):
-            # Get queue to add exception
-            _rslt_q = getattr(_locals['self'], '_rslt_q')
+    # Worker the exception is raised under, tracked by the interceptor rather than found by
+    # walking the frames of the stack.
+    worker = current_join_point(WorkerProcess)
+    _rslt_q = getattr(worker.target, '_rslt_q', None) if worker is not None else None
     if not _rslt_q:
         raise ValueError("No Queue found.")
     # Add interceptor exception
-    _rslt_q.put(arg[3].message, interceptor=True)
+    _rslt_q.put(join_point.args[0].message, interceptor=True)
 
 
-def extract_worker_exc(*arg, **kw):
+def extract_worker_exc(join_point):
     """Get exception added by worker"""
-    _self = arg[0]
-    if not isinstance(_self, StrategyBase):
-        # Run for StrategyBase instance only
-        return
+    _self = join_point.target
     # Iterate over workers to get their task and queue
     for _worker_prc, _main_q, _rslt_q in _self._workers:
         _task = _worker_prc._task
@@ -94,14 +71,17 @@ if __name__ == '__main__':
     fptr = open(os.devnull, 'w')  # pylint: disable=C0103
     sys.stdout = fptr
 
-    ASPECTS = {
-        r'__init__': dict(
+    # Advices are woven only into the classes they are meant for. Runs of the workers have no
+    # advices, but are tracked in the context for the exceptions to find their worker by.
+    ASPECTS = Aspects({
+        Pointcut(r'__init__', within=AnsibleUndefinedVariable): dict(
             around_after=queue_exc
         ),
-        r'run': dict(
+        Pointcut(r'run', within=StrategyBase): dict(
             before=extract_worker_exc
-        )
-    }
+        ),
+        Pointcut(r'run', within=WorkerProcess): dict(),
+    }, context=True)
     for _class in ANSIBLE_CLASSES:
         intercept(ASPECTS)(_class)
     # Run playbook in check mode.
@@ -0,0 +1,926 @@
+"""Decorator style interceptor implementation"""
+
+import dis
+import inspect
+import itertools
+import random
+import re
+import sys
+import threading
+import time
+import weakref
+
+from functools import wraps
+
+from interceptor.joinpoint import CURRENT, JoinPoint, current_join_point
+from interceptor.offload import DEFAULT_POOL, AdvicePool, Offload  # pylint: disable=W0611
+
+# Advices running once the method has run, which can be offloaded.
+POST_CALL_ADVICES = ('after_exc', 'around_after', 'after_success', 'after_finally')
+PRE_CALL_ADVICES = ('before', 'around_before')
+
+_DEFAULT_FLAGS = re.compile('').flags
+# Joint-points combined in a regex, as Python 2 supports at most 100 groups in a regex
+_MAX_COMBINED = 99
+# Code of the wrappers compiled, by their source
+_CODE = dict()
+# Coroutine functions are available since Python 3.5 only
+_iscoroutinefunction = getattr(inspect, 'iscoroutinefunction', lambda func: False)
+# Re-raise the exception being handled with its original traceback, even if an advice has handled
+# another exception meanwhile. Exception is thrown into a generator alone in Python 3, as throwing
+# its type, value and traceback is deprecated.
+if sys.version_info[0] < 3:
+    _RERAISE = "raise exc_info[0], exc_info[1], exc_info[2]"
+    _THROW = "gen.throw(*sys.exc_info())"
+else:
+    _RERAISE = "raise exc_info[1].with_traceback(exc_info[2])"
+    _THROW = "gen.throw(sys.exc_info()[1])"
+
+
+def _normalize(advices):
+    """Normalize implementations of every advice to a tuple, once for all the calls"""
+    normalized = dict()
+    for advice, impl in advices.items():
+        if not isinstance(impl, (list, tuple, set)):
+            impl = (impl,)
+        if advice not in POST_CALL_ADVICES and any(isinstance(item, Offload) for item in impl):
+            raise ValueError("Only advices after the method can be offloaded, not %s" % advice)
+        normalized[advice] = tuple(impl)
+    return normalized
+
+
+class Pointcut(object):
+    """Joint-point of Aspects along with filters of the classes and the calls it applies to.
+
+    Its advices are woven into methods of the subclasses of within only, a class or tuple of
+    classes, which is resolved at weave time. They are run only for the calls when returns true
+    for, called with the instance and arguments of the call once, before any advice runs.
+    """
+    __slots__ = ('pattern', 'within', 'when')
+
+    def __init__(self, pattern, within=None, when=None):
+        self.pattern = pattern
+        self.within = within
+        self.when = when
+
+    def __repr__(self):
+        return 'Pointcut(%r, within=%r, when=%r)' % (self.pattern, self.within, self.when)
+
+
+class _When(object):
+    """Advice implementation run only for the calls the predicate of its pointcut returns true"""
+    __slots__ = ('advice', 'predicate')
+
+    def __init__(self, advice, predicate):
+        self.advice = advice
+        self.predicate = predicate
+
+
+class _RateLimit(object):
+    """Sample at most the given number of calls every second"""
+    def __init__(self, per_second):
+        self.per_second = per_second
+        self.count = 0
+        self.window_end = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            now = time.time()
+            if now >= self.window_end:
+                self.window_end, self.count = now + 1, 0
+            if self.count >= self.per_second:
+                return False
+            self.count += 1
+            return True
+
+
+def _sampler(one_in=None, probability=None, per_second=None):
+    """Get callable telling whether a call is sampled, or None to sample every call"""
+    options = [option for option in (one_in, probability, per_second) if option is not None]
+    if len(options) > 1:
+        raise ValueError("Only one of one_in, probability and per_second can be given")
+    if one_in is not None:
+        if one_in < 1:
+            raise ValueError("one_in must be at least 1")
+        if one_in == 1:
+            return None
+        # Counter rather than a cycle of one_in flags, as one_in can be large.
+        count = itertools.count()
+        return lambda: next(count) % one_in == 0
+    if probability is not None:
+        if not 0 <= probability <= 1:
+            raise ValueError("probability must be between 0 and 1")
+        rand = random.random
+        return lambda: rand() < probability
+    if per_second is not None:
+        return _RateLimit(per_second)
+    return None
+
+
+def _indent(lines):
+    """Indent generated source lines by a level"""
+    return ['    ' + line for line in lines]
+
+
+def _guard(block, on_exc, on_success, on_finally):
+    """Source lines running advices after the block running the method, which sets ret"""
+    if on_exc:
+        block = (['try:'] + _indent(block) +
+                 ['except Exception as e:', '    exc_info = sys.exc_info()'] +
+                 _indent(on_exc + [_RERAISE]))
+    block = block + on_success
+    if on_finally:
+        block = ['ret = None', 'try:'] + _indent(block) + ['finally:'] + _indent(on_finally)
+    return block
+
+
+def _stream_lines(on_yield):
+    """Source lines passing items of the generator method through, along with the values and
+    exceptions sent to them. Return value of the generator is set to ret once it is exhausted.
+    """
+    return [
+        'ret = None',
+        'gen = func(self, *arg, **kw)',
+        'try:',
+        '    item = next(gen)',
+        '    while True:'] + _indent(_indent(on_yield)) + [
+        '        try:',
+        '            sent = yield item',
+        '        except GeneratorExit:',
+        '            gen.close()',
+        '            raise',
+        '        except BaseException:',
+        '            item = %s' % _THROW,
+        '        else:',
+        '            item = gen.send(sent)',
+        'except StopIteration as stop:',
+        "    ret = getattr(stop, 'value', None)"]
+
+
+class MethodInfo(object):
+    """Method woven, along with its metadata computed once at weave time.
+
+    Advices are passed it as the method. Attributes other than the metadata are looked up on the
+    method, and calling it calls the method.
+    """
+    __slots__ = ('method', 'func', 'cls', 'name', 'module', 'filename', 'first_line', 'last_line')
+
+    def __init__(self, cls, name, method):
+        self.method = method
+        self.func = func = getattr(method, '__func__', method)  # Python 3 has no unbound methods
+        self.cls = cls
+        self.name = name
+        self.module = func.__module__
+        code = func.__code__
+        self.filename = code.co_filename
+        self.first_line = code.co_firstlineno
+        # Last line having code, from the line number table of the code
+        self.last_line = max([self.first_line] + [
+            line for _, line in dis.findlinestarts(code) if line is not None])
+
+    def __getattr__(self, item):
+        if item == 'method':
+            raise AttributeError(item)
+        return getattr(self.method, item)
+
+    def __call__(self, *arg, **kw):
+        return self.method(*arg, **kw)
+
+    def __repr__(self):
+        return '<MethodInfo %s.%s at %s:%d-%d>' % (
+            self.cls.__name__, self.name, self.filename, self.first_line, self.last_line)
+
+
+# Attribute of JoinPoint set to the value of the call passed to the advices in legacy convention
+_JOIN_POINT_ATTRS = dict(e='exception', ret='result', item='item')
+
+
+class _Source(object):
+    """Source lines of a wrapper being generated, along with the values of its parameters"""
+    __slots__ = ('info', 'advices', 'legacy', 'is_async', 'params', 'values', 'guards')
+
+    def __init__(self, info, func, sample, advices, legacy):
+        self.info = info
+        self.advices = advices
+        self.legacy = legacy
+        self.is_async = _iscoroutinefunction(func)
+        self.params, self.values = ['method', 'func', 'sample'], [info, func, sample]
+        self.guards = dict()  # {id of a predicate guarding advices: index of its flag}
+
+    @property
+    def awaits(self):
+        """Prefix of the calls awaited by the wrapper"""
+        return 'await ' if self.is_async else ''
+
+    def bind(self, name, value):
+        """Add parameter of the function making the wrapper, along with its value"""
+        self.params.append(name)
+        self.values.append(value)
+
+    def predicates(self, call):
+        """Lines running the call straight if the only predicate of all the advices is false, and
+        lines setting flags of the predicates guarding the advices otherwise, once per call.
+        """
+        predicates = list()
+        impls = list(itertools.chain(*self.advices.values()))
+        for impl in impls:
+            if isinstance(impl, _When) and id(impl.predicate) not in self.guards:
+                self.guards[id(impl.predicate)] = len(predicates)
+                predicates.append(impl.predicate)
+        if len(predicates) == 1 and all(isinstance(impl, _When) for impl in impls):
+            self.guards.clear()
+            self.bind('when', predicates[0])
+            return ['if not when(self, *arg, **kw):', '    return ' + call], list()
+        checks = list()
+        for indx, predicate in enumerate(predicates):
+            self.bind('when_%d' % indx, predicate)
+            checks.append('ok_%d = when_%d(self, *arg, **kw)' % (indx, indx))
+        return list(), checks
+
+    def calls(self, advice, extra_arg):
+        """Lines calling every implementation of the advice"""
+        lines, coroutines = [], []
+        for indx, impl in enumerate(self.advices.get(advice, ())):
+            name = '%s_%d' % (advice, indx)
+            guard = ''
+            if isinstance(impl, _When):
+                if self.guards:
+                    guard = 'if ok_%d: ' % self.guards[id(impl.predicate)]
+                impl = impl.advice
+            args = ('self, method, %s, *arg, **kw' % extra_arg) if self.legacy else 'jp'
+            if isinstance(impl, Offload):
+                # Submit straight to the pool rather than through Offload.__call__
+                self.bind(name, impl.advice)
+                self.bind('submit_' + name, impl.pool.submit)
+                lines.append('%ssubmit_%s(%s, %s)' % (
+                    guard, name, name, args if self.legacy else 'jp.snapshot()'))
+                continue
+            self.bind(name, impl)
+            call = '%s(%s)' % (name, args)
+            if not _iscoroutinefunction(impl):
+                lines.append(guard + call)
+            elif not self.is_async:
+                raise TypeError("Coroutine advice %r can advise only coroutine methods, not %s" % (
+                    impl, self.info.name))
+            elif guard:
+                lines.append('%sawait %s' % (guard, call))
+            else:
+                coroutines.append(call)
+        if len(coroutines) == 1:
+            lines.append('await ' + coroutines[0])
+        elif coroutines:
+            lines.append('await gather(%s)' % ', '.join(coroutines))
+        if lines and not self.legacy and extra_arg != 'None':
+            lines.insert(0, 'jp.%s = %s' % (_JOIN_POINT_ATTRS[extra_arg], extra_arg))
+        return lines
+
+    def _around(self, indx, impl):
+        """Bind the around advice, and get index of the flag of the predicate guarding it if any"""
+        guard = None
+        if isinstance(impl, _When):
+            guard = self.guards.get(id(impl.predicate))
+            impl = impl.advice
+        if _iscoroutinefunction(impl) != self.is_async:
+            raise TypeError("Around advice %r of %s %s be a coroutine function" % (
+                impl, self.info.name, 'must' if self.is_async else "can't"))
+        self.bind('around_%d' % indx, impl)
+        return guard
+
+    def legacy_chain(self):
+        """Functions chaining the around advices outermost first, each passed the next to proceed
+        with by the instance and arguments, the last the method, the call of the first, and whether
+        the functions check flags of the call.
+        """
+        around, awaits = self.advices['around'], self.awaits
+        define, chain, proceed = 'async def' if self.is_async else 'def', list(), 'func'
+        flags = False
+        for indx in reversed(range(len(around))):
+            guard = self._around(indx, around[indx])
+            advised = '%saround_%d(self, method, %s, *arg, **kw)' % (awaits, indx, proceed)
+            skipped = '%s%s(self, *arg, **kw)' % (awaits, proceed)
+            if indx == 0:
+                break
+            proceed = 'proceed_%d' % indx
+            chain.append('%s %s(self, *arg, **kw):' % (define, proceed))
+            if guard is not None:
+                chain += ['    if not ok_%d:' % guard, '        return ' + skipped]
+                flags = True
+            chain.append('    return ' + advised)
+        return chain, advised if guard is None else '%s if ok_%d else %s' % (
+            advised, guard, skipped), flags
+
+    def chain(self):
+        """Functions chaining the around advices outermost first, each a step proceeding by the
+        join point to the next, the last the method, the call of the first, and whether the steps
+        check flags of the call.
+        """
+        if self.legacy:
+            return self.legacy_chain()
+        around, awaits = self.advices['around'], self.awaits
+        define, proceed = 'async def' if self.is_async else 'def', 'step_%d' % len(around)
+        chain = ['%s %s(jp):' % (define, proceed),
+                 '    return %sfunc(jp.target, *jp.args, **jp.kwargs)' % awaits]
+        flags = False
+        for indx in reversed(range(len(around))):
+            guard = self._around(indx, around[indx])
+            # Step of the around advice sets the step it proceeds to, and back once done, so that
+            # an advice outer to it can proceed again.
+            step, skipped = 'step_%d' % indx, '%s%s(jp)' % (awaits, proceed)
+            chain.append('%s %s(jp):' % (define, step))
+            if guard is not None and indx:
+                chain += ['    if not ok_%d:' % guard, '        return ' + skipped]
+                flags = True
+            chain += ['    jp._proceed = ' + proceed,
+                      '    try:',
+                      '        return %saround_%d(jp)' % (awaits, indx),
+                      '    finally:',
+                      '        jp._proceed = ' + step]
+            proceed = step
+        call = '%sstep_0(jp)' % awaits
+        return chain, call if guard is None else '%s if ok_%d else %s' % (
+            call, guard, skipped), flags
+
+    def run(self, checks, call, is_stream):
+        """Lines of the wrapper running the advices along with the call, and the generator function
+        defined along with it for a generator method, running the advices while it is iterated.
+        """
+        before = checks + self.calls('before', 'None') + self.calls('around_before', 'None')
+        on_exc = self.calls('after_exc', 'e')
+        on_success = self.calls('around_after', 'ret') + self.calls('after_success', 'ret')
+        on_finally = self.calls('after_finally', 'ret')
+        if is_stream:
+            stream = ['def stream(self, arg, kw):'] + _indent(before + _guard(
+                _stream_lines(self.calls('after_yield', 'item')), on_exc, on_success, on_finally))
+            return stream, ['return stream(self, arg, kw)']
+        if not (on_exc or on_success or on_finally):
+            return list(), before + ['return ' + call]
+        return list(), (before + _guard(['ret = ' + call], on_exc, on_success, on_finally) +
+                        ['return ret'])
+
+    def in_context(self, body):
+        """Lines of the body, following the join point built, run with the join point current"""
+        # Join point is current while the call is in flight, outer to the calls it makes.
+        self.bind('current', CURRENT)
+        return (body[:1] + ['jp.outer = current.get()', 'token = current.set(jp)', 'try:'] +
+                _indent(body[1:]) + ['finally:', '    current.reset(token)'])
+
+    def build(self, func, defined, body, is_stream):
+        """Wrapper of the function, running the body, along with the functions defined for it"""
+        namespace = dict(sys=sys)
+        if self.is_async:
+            import asyncio  # pylint: disable=F0401
+            namespace['gather'] = asyncio.gather
+        # Name of the wrapper is kept as trivial for the advices skipping interceptor frames.
+        source = '\n'.join(['def make(%s):' % ', '.join(self.params)] +
+                           _indent(defined) +
+                           ['    %sdef trivial(self, *arg, **kw):' % (
+                               'async ' if self.is_async else '')] +
+                           _indent(_indent(body)) +
+                           ['    return trivial'])
+        # Wrappers of the methods having the same number of every advice have the same source
+        try:
+            code = _CODE[source]
+        except KeyError:
+            code = _CODE.setdefault(source, compile(source, '<interceptor>', 'exec'))
+        exec(code, namespace)  # pylint: disable=W0122
+        wrapper = wraps(func)(namespace['make'](*self.values))
+        wrapper.__wrapped__ = func
+        wrapper._interceptor_stream = is_stream
+        return wrapper
+
+
+def _compile_wrapper(info, func, advices, sample=None, legacy=False, context=False):
+    """Generate the wrapper calling the function with advices of the method around.
+
+    Source of the wrapper is specialized for the advices the method actually has, in the manner of
+    namedtuple, so that a call doesn't look up, type check or loop over advices the method doesn't
+    have. Advice implementations are bound as closure variables of the wrapper. Advices are passed
+    the JoinPoint of the call, or in the legacy convention the instance, info of the method, the
+    result, exception or item, and the arguments of the call.
+
+    If sample is given, it is called once per call and the call is run without any advice unless
+    it returns true, which keeps advices of the same call together. Predicates of the pointcuts are
+    called once per call as well, before any advice runs. If all the advices have the same
+    predicate, the call is run without any advice unless it returns true.
+
+    Around advices are chained by proceed functions defined along with the wrapper, the last
+    proceeding to the function, and the result of the first is the result of the call.
+
+    Wrapper of a coroutine method is a coroutine awaiting the method. Its coroutine advices are
+    awaited after the other implementations of the same advice have run, concurrently if more
+    than one.
+
+    Wrapper of a generator method returns a generator passing the items through lazily. Advices
+    before the method run when the iteration starts, and after_yield runs for every item. Advices
+    after the method run once the generator is exhausted, raises or, for after_finally, is closed.
+
+    If context, the join point of the call is the current join point while the call is in flight,
+    sampled or not, unless the method is a generator method.
+    """
+    source = _Source(info, func, sample, advices, legacy)
+    call = source.awaits + 'func(self, *arg, **kw)'
+    body = ['if not sample():', '    return ' + call] if sample is not None else list()
+    lines, checks = source.predicates(call)
+    body += lines
+    is_stream = inspect.isgeneratorfunction(func) or getattr(func, '_interceptor_stream', False)
+    context = context and not is_stream
+    if not legacy or context:
+        # Join point of the call is built once, for all the advices of the call.
+        source.bind('JoinPoint', JoinPoint)
+        (body if context else checks).insert(0, 'jp = JoinPoint(self, method, arg, kw)')
+    # Around advices are chained outermost first, each given the next to proceed with, the last
+    # the method. Functions proceeding with the call are defined once, along with the wrapper.
+    chain, flags = list(), False
+    if advices.get('around'):
+        if is_stream:
+            raise TypeError("Around advice can't advise generator method %s" % info.name)
+        chain, call, flags = source.chain()
+    stream, lines = source.run(checks, call, is_stream)
+    if flags:
+        # Functions checking flags of the predicates, called once per call, are defined per call.
+        body += chain
+        chain = list()
+    body += lines
+    if context:
+        body = source.in_context(body)
+    return source.build(func, stream + chain, body, is_stream)
+
+
+class Aspects(object):
+    """Joint-points and their advices compiled for matching against method names.
+
+    Joint-points that are plain method names, optionally around \\b, ^ or $, are indexed by name.
+    Rest of the joint-points are matched together by a single combined regex. Advices resolved for
+    a method name are memoized, so weaving many classes with the same aspects resolves a name
+    only once.
+
+    Advices can be run for a sample of the calls, one_in every so many calls, with the probability
+    or at most per_second calls. Calls not sampled run the method without any of the advices.
+
+    Joint-points can be Pointcuts filtering the classes and the calls their advices apply to.
+
+    Advices are passed the JoinPoint of the call, unless legacy, in which case they are passed the
+    instance, MethodInfo of the method, the result, exception or item, and the arguments.
+
+    If context, calls of the methods matching the joint-points, even ones having no advices, are
+    tracked as current join points, found by current_join_point.
+    """
+    # Characters making a joint-point a regex rather than a method name.
+    _SPECIAL = frozenset('.^$*+?{}[]\\|()')
+
+    def __init__(self, aspects, one_in=None, probability=None, per_second=None, legacy=False,
+                 context=False):
+        if not isinstance(aspects, dict):
+            raise TypeError("Aspects must be a dictionary of joint-points and advices")
+        self.sample = _sampler(one_in, probability, per_second)
+        self.legacy = legacy
+        self.context = context
+        self._advices = list()   # (method name of the joint-point if any, advices) in given order
+        self._exact = dict()     # method name: indices of joint-points matching exactly the name
+        self._prefix = dict()    # name prefix: indices of joint-points matching name starting so
+        self._wildcards = list()  # (index, compiled regex) of the joint-points matched singly
+        self._within = dict()    # index: classes the joint-point is woven into subclasses of
+        self._cache = dict()     # method name: indices of joint-points matching it
+        self._merged = dict()    # (method name, indices of joint-points): advices merged
+        self.enabled = True
+        combinable = list()
+        for indx, (joint_point, advices) in enumerate(aspects.items()):
+            advices = _normalize(advices)
+            if isinstance(joint_point, Pointcut):
+                if joint_point.within is not None:
+                    self._within[indx] = joint_point.within
+                if joint_point.when is not None:
+                    advices = dict((advice, tuple(_When(item, joint_point.when) for item in impl))
+                                   for advice, impl in advices.items())
+                joint_point = joint_point.pattern
+            literal, exact = self._literal(joint_point)
+            self._advices.append((literal, advices))
+            if literal is None:
+                regex = re.compile(joint_point)
+                if regex.groups or regex.flags != _DEFAULT_FLAGS:
+                    # Groups, back-references and inline flags won't survive being combined with
+                    # other joint-points.
+                    self._wildcards.append((indx, regex))
+                else:
+                    combinable.append((indx, joint_point))
+            else:
+                (self._exact if exact else self._prefix).setdefault(literal, []).append(indx)
+        self._combined = list()  # (combined regex, (index, group) of its joint-points)
+        for start in range(0, len(combinable), _MAX_COMBINED):
+            chunk = combinable[start:start + _MAX_COMBINED]
+            try:
+                # Every joint-point is an optional lookahead capturing an empty group, so that a
+                # single match tells all the joint-points matching the name.
+                self._combined.append((re.compile(''.join(
+                    '(?:(?=(?:%s))(?P<_%d>))?' % (joint_point, indx)
+                    for indx, joint_point in chunk)), tuple(
+                        (indx, '_%d' % indx) for indx, _ in chunk)))
+            except re.error:
+                self._wildcards.extend(
+                    (indx, re.compile(joint_point)) for indx, joint_point in chunk)
+                self._wildcards.sort()
+
+    @classmethod
+    def _literal(cls, joint_point):
+        """Get method name the joint-point is made of, and whether it matches just that name.
+
+        Name is None for a regex. A name matches method names starting with it, unless followed
+        by \\b, $ or \\Z.
+        """
+        name, exact = joint_point, False
+        for prefix in (r'\b', '^'):
+            if name.startswith(prefix):
+                name = name[len(prefix):]
+        for suffix in (r'\b', '$', r'\Z'):
+            if name.endswith(suffix) and not name.endswith('\\' + suffix):
+                name, exact = name[:-len(suffix)], True
+        if not name or cls._SPECIAL.intersection(name):
+            return None, False
+        return name, exact
+
+    def _matching(self, name):
+        """Indices of joint-points matching the method name, in the order they were given"""
+        matching = list(self._exact.get(name, ()))
+        if self._prefix:
+            for end in range(1, len(name) + 1):
+                matching.extend(self._prefix.get(name[:end], ()))
+        for combined, groups in self._combined:
+            match = combined.match(name)
+            matching.extend(indx for indx, group in groups if match.group(group) is not None)
+        matching.extend(indx for indx, regex in self._wildcards if regex.match(name))
+        return sorted(matching)
+
+    def _indices(self, name, cls=None):
+        """Indices of joint-points matching the method name, of the class if given"""
+        try:
+            indices = self._cache[name]
+        except KeyError:
+            indices = self._cache[name] = tuple(self._matching(name))
+        if self._within:
+            indices = tuple(indx for indx in indices if indx not in self._within or (
+                cls is not None and issubclass(cls, self._within[indx])))
+        return indices
+
+    def match(self, name, cls=None):
+        """Get all advices matching method name, of the class if given.
+
+        Advices from all matching joint-points are merged. In case of conflicting advices,
+        joint-point exactly matching the name of the method is given preference over the others,
+        which are preferred in the order they were given. Pointcuts filtering classes match only
+        methods of the subclasses of their classes.
+        """
+        indices = self._indices(name, cls)
+        try:
+            return self._merged[name, indices]
+        except KeyError:
+            pass
+        all_advices = dict()
+        for indx in indices:
+            literal, advices = self._advices[indx]
+            for advice, impl in advices.items():
+                if advice in all_advices and literal != name:
+                    continue
+                all_advices[advice] = impl
+        self._merged[name, indices] = all_advices
+        return all_advices
+
+
+# Methods of the classes woven by intercept, {class: {method name: _Weaving}}
+_WOVEN = weakref.WeakKeyDictionary()
+# Methods of the classes intercepted lazily, not woven yet, {class: {method name: _Lazy}}
+_PENDING = weakref.WeakKeyDictionary()
+_LAZY_LOCK = threading.RLock()
+# Marks the original of a woven method to be inherited rather than defined by the class.
+_INHERITED = object()
+_ENABLED = True
+
+
+def _restore(cls, name, original):
+    """Set the attribute back to the class as it was, or remove it if it was inherited"""
+    if original is not _INHERITED:
+        setattr(cls, name, original)
+    elif name in cls.__dict__:
+        delattr(cls, name)
+
+
+def _merge(inner, outer):
+    """Advices of two layers as a single layer, advices of the outer layer running first before the
+    method, around it and last after it
+    """
+    merged = dict(inner)
+    for advice, impl in outer.items():
+        if advice in PRE_CALL_ADVICES or advice == 'around':
+            merged[advice] = impl + merged.get(advice, ())
+        else:
+            merged[advice] = merged.get(advice, ()) + impl
+    return merged
+
+
+class _Weaving(object):
+    """Aspects woven into a method of a class, along with the method as it was before weaving"""
+    __slots__ = ('original', 'info', 'layers', 'base')
+
+    def __init__(self, original, info, base=None):
+        self.original = original  # Attribute of the class, or _INHERITED
+        self.info = info
+        self.layers = list()      # (Aspects, advices) wrapped innermost first
+        self.base = base          # Weaving of the method inherited, woven into a base class
+
+    def chain(self):
+        """Layers of the weaving inherited and of this weaving, innermost first"""
+        if self.base is None:
+            return self.layers
+        return self.base.chain() + self.layers
+
+    def install(self, cls, name):
+        """Set wrapper of the enabled aspects to the class, or the original method if none is.
+
+        Advices of the layers are flattened into a single wrapper, unless the layers sample the
+        calls differently or pass advices differently. Calls are tracked in the context if any of
+        the layers flattened tracks them.
+        """
+        func, wrapper, merged = self.info.func, None, None
+        sample = legacy = context = None
+        for aspects, advices in self.chain():
+            if not (_ENABLED and aspects.enabled):
+                continue
+            if merged is not None and aspects.sample is sample and aspects.legacy == legacy:
+                merged = _merge(merged, advices)
+                context = context or aspects.context
+                continue
+            if merged is not None:
+                wrapper = func = _compile_wrapper(self.info, func, merged, sample, legacy, context)
+            merged, sample, legacy, context = (
+                advices, aspects.sample, aspects.legacy, aspects.context)
+        if merged is not None:
+            wrapper = _compile_wrapper(self.info, func, merged, sample, legacy, context)
+        if wrapper is not None:
+            setattr(cls, name, wrapper)
+        else:
+            self.restore(cls, name)
+
+    def restore(self, cls, name):
+        """Set the method back to the class as it was before weaving"""
+        _restore(cls, name, self.original)
+
+
+class _Lazy(object):
+    """Placeholder of a method of a class intercepted lazily, weaving the method on first access"""
+    __slots__ = ('cls', 'name', 'aspects', 'original')
+
+    def __init__(self, cls, name, aspects):
+        self.cls = cls
+        self.name = name
+        self.aspects = aspects
+        self.original = cls.__dict__.get(name, _INHERITED)
+
+    def unwrap(self):
+        """Attribute of the class before it was intercepted lazily"""
+        original = self.original
+        while isinstance(original, _Lazy):
+            original = original.original
+        return original
+
+    def __get__(self, obj, owner=None):
+        with _LAZY_LOCK:
+            if self.cls.__dict__.get(self.name) is self:
+                pending = _PENDING[self.cls]
+                if isinstance(self.original, _Lazy):
+                    pending[self.name] = self.original
+                else:
+                    del pending[self.name]
+                _restore(self.cls, self.name, self.original)
+                _weave(self.cls, self.name, getattr(self.cls, self.name), self.aspects)
+        # Bound from the class of the placeholder on, not the type of the instance, so that a
+        # call by super() doesn't get the method of a subclass.
+        for klass in inspect.getmro(self.cls):
+            if self.name in vars(klass):
+                attr = vars(klass)[self.name]
+                return attr.__get__(obj, owner) if hasattr(attr, '__get__') else attr
+        raise AttributeError(self.name)
+
+
+def _reinstall(aspects=None):
+    """Reinstall methods woven with the aspects, or every woven method"""
+    for cls, weavings in _WOVEN.items():
+        for name, weaving in weavings.items():
+            if aspects is None or any(layer[0] is aspects for layer in weaving.chain()):
+                weaving.install(cls, name)
+
+
+def _resolve(aspects):
+    """Aspects given, or the ones intercept compiles the mapping given into, without options"""
+    if aspects is None or isinstance(aspects, Aspects):
+        return aspects
+    if not isinstance(aspects, dict):
+        raise TypeError("Aspects or mapping of joint-points and advices expected, not %r" % (
+            type(aspects).__name__))
+    return _compiled(aspects, dict())
+
+
+def enable(aspects=None):
+    """Swap in the wrappers of the aspects, or of all the aspects if none is given. Aspects can be
+    given as the mapping they are intercepted with, unless intercepted with options.
+    """
+    global _ENABLED  # pylint: disable=W0603
+    aspects = _resolve(aspects)
+    if aspects is None:
+        _ENABLED = True
+    else:
+        aspects.enabled = True
+    _reinstall(aspects)
+
+
+def disable(aspects=None):
+    """Swap the original methods back in for the aspects, or for all the aspects if none is given.
+
+    Disabled methods are run as they were before weaving, without any wrapper checking a flag.
+    Aspects can be enabled again to swap the wrappers back in. Aspects can be given as the mapping
+    they are intercepted with, unless intercepted with options.
+    """
+    global _ENABLED  # pylint: disable=W0603
+    aspects = _resolve(aspects)
+    if aspects is None:
+        _ENABLED = False
+    else:
+        aspects.enabled = False
+    _reinstall(aspects)
+
+
+def unintercept(cls):
+    """Restore methods of the class woven by intercept and forget the class"""
+    with _LAZY_LOCK:
+        weavings = _WOVEN.pop(cls, dict())
+        for name, lazy in _PENDING.pop(cls, dict()).items():
+            if name not in weavings:
+                _restore(cls, name, lazy.unwrap())
+        for name, weaving in weavings.items():
+            del weaving.layers[:]
+            weaving.restore(cls, name)
+        # Subclasses inheriting the methods keep only their own layers.
+        removed = set(weavings.values())
+        for other, others in list(_WOVEN.items()):
+            for name, weaving in others.items():
+                if weaving.base in removed:
+                    weaving.install(other, name)
+    return cls
+
+
+def _methods(cls):
+    """Get name and method of the instance methods of the class, leaving out static and class
+    methods. Methods are unbound methods in Python 2 and functions in Python 3.
+    """
+    for name, method in inspect.getmembers(cls):
+        for klass in inspect.getmro(cls):
+            if name in vars(klass):
+                if inspect.isfunction(vars(klass)[name]):
+                    yield name, method
+                break
+
+
+def _method_names(cls):
+    """Get names of the instance methods of the class, from dictionaries of the classes in MRO"""
+    seen = set()
+    for klass in inspect.getmro(cls):
+        for name, attr in list(vars(klass).items()):
+            if name not in seen:
+                seen.add(name)
+                if inspect.isfunction(attr) or isinstance(attr, _Lazy):
+                    yield name
+
+
+def _inherited(cls, name):
+    """Weaving of the method of a base class the class inherits, if the method is woven"""
+    for klass in inspect.getmro(cls)[1:]:
+        if name in vars(klass):
+            return _WOVEN.get(klass, dict()).get(name)
+    return None
+
+
+def _weave(cls, name, method, aspects):
+    """Weave the method of the class with the advices of the aspects matching its name.
+
+    Aspects are woven once into a method, including the methods inherited woven. Aspects added to
+    a method woven are flattened into the advices of its wrapper.
+    """
+    matching_advices = aspects.match(name, cls)
+    if not (matching_advices or aspects.context and aspects._indices(name, cls)):
+        return
+    weavings = _WOVEN.setdefault(cls, dict())
+    weaving = weavings.get(name)
+    if weaving is None:
+        base = None if name in cls.__dict__ else _inherited(cls, name)
+        if base is not None:
+            if any(layer[0] is aspects for layer in base.chain()):
+                return
+            method = base.info.method
+        weaving = _Weaving(cls.__dict__.get(name, _INHERITED), MethodInfo(cls, name, method), base)
+    elif any(layer[0] is aspects for layer in weaving.chain()):
+        return
+    weaving.layers.append((aspects, matching_advices))
+    try:
+        weaving.install(cls, name)
+    except Exception:
+        # Keep the method as it was, and unregistered if it wasn't woven yet.
+        weaving.layers.pop()
+        raise
+    weavings[name] = weaving
+
+
+def _intercepted(name):
+    """Whether methods of the name are intercepted, leaving out magic methods except __init__"""
+    return name == '__init__' or not name.startswith('__')
+
+
+# Aspects compiled by intercept, by the joint-points, advices and options they are compiled from,
+# as long as the aspects are woven
+_COMPILED = weakref.WeakValueDictionary()
+_SAMPLING = ('one_in', 'probability', 'per_second')
+
+
+def _compiled(aspects, options):
+    """Aspects compiled from the mapping and options, the same for the same advices of the same
+    joint-points, so that intercepting a class with them again doesn't advise the calls again.
+    Aspects sampling the calls are compiled afresh, keeping a sample of their own.
+    """
+    if any(options.get(option) is not None for option in _SAMPLING):
+        return Aspects(aspects, **options)
+    try:
+        key = tuple((joint_point, tuple(sorted(
+            (advice, tuple(impl) if isinstance(impl, (list, tuple, set)) else impl)
+            for advice, impl in advices.items()))) for joint_point, advices in aspects.items())
+        key = key, tuple(sorted(options.items()))
+        compiled = _COMPILED.get(key)
+    except (AttributeError, TypeError):  # Not a mapping of advices, or not hashable
+        return Aspects(aspects, **options)
+    if compiled is None:
+        compiled = _COMPILED.setdefault(key, Aspects(aspects, **options))
+    return compiled
+
+
+def intercept(aspects, lazy=False, **options):
+    """Decorate class to intercept its matching methods and apply advices on them.
+
+    Advices are the cross-cutting concerns that need to be separated out from the business logic.
+    This decorator applies such advices to the decorated class.
+
+    :arg aspects: mapping of joint-points to dictionary of advices, or the mapping compiled as
+    Aspects to share matching across the classes decorated with it. joint-points are regex
+    patterns to be matched against methods of class. If the pattern matches to name of a method,
+    the advices available for the joint-point are applied to the method. Advices from all matching
+    joint-points are applied to the method. In case of conflicting advices for a joint-point,
+    joint-point exactly matching the name of the method is given preference.
+
+    Following are the identified advices:
+        before: Runs before around before
+        around_before: Runs before the method
+        around: Runs instead of the method, returning the result of the call. It proceeds with the
+            call, if at all, by proceed of the join point. Around advices of a method are chained,
+            the first outermost.
+        after_exc: Runs when method encounters exception
+        around_after: Runs after method is successful
+        after_success: Runs after method is successful
+        after_finally: Runs after method is run successfully or unsuccessfully.
+        after_yield: Runs after generator method yields an item, which is passed instead of the
+            return value.
+
+    Advices are passed the JoinPoint of the call, having the instance as target, MethodInfo of the
+    method, the arguments, and the result, exception or item if any. Aspects compiled with
+    legacy=True are passed the instance, MethodInfo of the method, the result, exception or item
+    if any, followed by the arguments of the call instead. Legacy around advice is passed the
+    function to proceed with the call by in place of the result, which it calls with the instance
+    and arguments.
+
+    Coroutine methods are awaited by their wrappers, which can have coroutine advices as well.
+
+    Keyword arguments one_in, probability or per_second, to run the advices for a sample of the
+    calls only, legacy and context are passed to Aspects.
+
+    Woven methods can be swapped back to their originals by unintercept, or by disable and then
+    enable again.
+
+    Lazy interception only puts placeholders for the methods of the class, and a method is matched
+    and woven on its first access, so that classes of many methods pay only for the ones used.
+    """
+    if not isinstance(aspects, Aspects):
+        aspects = _compiled(aspects, options)
+    elif options:
+        raise TypeError("Options of compiled Aspects must be given while compiling them")
+
+    def decorate_class(cls):
+        """Decorating class"""
+        # TODO: handle staticmethods and classmethods
+        if lazy:
+            with _LAZY_LOCK:
+                pending = _PENDING.setdefault(cls, dict())
+                for name in _method_names(cls):
+                    if _intercepted(name):
+                        pending[name] = _Lazy(cls, name, aspects)
+                        setattr(cls, name, pending[name])
+            return cls
+        for name, method in _methods(cls):
+            if _intercepted(name):
+                _weave(cls, name, method, aspects)
+        return cls
+    return decorate_class
@@ -0,0 +1,108 @@
+"""Memoization aspect caching results of the intercepted methods by their arguments"""
+
+import threading
+import time
+
+from collections import OrderedDict
+
+from interceptor import Aspects
+
+clock = getattr(time, 'monotonic', time.time)  # Python 2 has no monotonic clock
+
+
+def default_key(obj, *arg, **kw):
+    """Key of the call by the instance and arguments, which must be hashable"""
+    return (obj, arg, tuple(sorted(kw.items()))) if kw else (obj, arg)
+
+
+class MethodCache(object):
+    """Results of an intercepted method, least recently used first, along with the counters"""
+    __slots__ = ('cls', 'name', 'results', 'hits', 'misses', 'evictions')
+
+    def __init__(self, cls, name):
+        self.cls = cls
+        self.name = name
+        self.results = OrderedDict()  # {key: (expiry or None, result)}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def snapshot(self):
+        """Summary of the cache"""
+        return dict(size=len(self.results), hits=self.hits, misses=self.misses,
+                    evictions=self.evictions)
+
+
+class Memoizer(object):
+    """Memoization aspect caching results of the methods per method, by key of the call.
+
+    The method is skipped on a hit by around advice returning the result cached. A cache keeps at
+    most max_size results, evicting the least recently used, and results expire ttl seconds after
+    they are cached if ttl is given. key is called with the instance and arguments of the call to
+    get a hashable key, which by default are the instance and arguments themselves. Calls having
+    an unhashable key aren't cached, and exceptions are never cached.
+
+        memoizer = Memoizer(max_size=100, ttl=60)
+        intercept(memoizer.aspects(r'get_rate'))(ExchangeClient)
+        ...
+        memoizer.snapshot()
+    """
+    def __init__(self, max_size=1024, ttl=None, key=default_key):
+        if max_size < 1:
+            raise ValueError("Size of the cache must be at least 1, not %r" % max_size)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.key = key
+        self._caches = dict()  # {MethodInfo: MethodCache}
+        self._lock = threading.Lock()
+        self.advices = dict(around=self._around)
+
+    def aspects(self, joint_point=r'.*'):
+        """Aspects memoizing the methods matching the joint-point"""
+        return Aspects({joint_point: self.advices})
+
+    def _cache_of(self, method):
+        """Cache of the method, by its MethodInfo, created on its first call"""
+        try:
+            return self._caches[method]
+        except KeyError:
+            cls = '%s.%s' % (method.cls.__module__, method.cls.__name__)
+            return self._caches.setdefault(method, MethodCache(cls, method.name))
+
+    def _around(self, join_point):
+        """Return the result cached for the call, or call and cache the result"""
+        cache = self._cache_of(join_point.method)
+        try:
+            key = self.key(join_point.target, *join_point.args, **join_point.kwargs)
+            hash(key)
+        except TypeError:
+            cache.misses += 1
+            return join_point.proceed()
+        results = cache.results
+        with self._lock:
+            if key in results:
+                expiry, result = results.pop(key)
+                if expiry is None or expiry > clock():
+                    results[key] = expiry, result
+                    cache.hits += 1
+                    return result
+            cache.misses += 1
+        result = join_point.proceed()
+        with self._lock:
+            results.pop(key, None)
+            results[key] = (None if self.ttl is None else clock() + self.ttl), result
+            while len(results) > self.max_size:
+                results.popitem(last=False)
+                cache.evictions += 1
+        return result
+
+    def snapshot(self):
+        """Summary of size, hits, misses and evictions, per class and method"""
+        return dict(((cache.cls, cache.name), cache.snapshot())
+                    for cache in list(self._caches.values()))
+
+    def clear(self):
+        """Forget results cached, keeping the counters"""
+        with self._lock:
+            for cache in self._caches.values():
+                cache.results.clear()
@@ -0,0 +1,166 @@
+"""Aspects coalescing concurrent identical calls and limiting concurrent calls of the methods"""
+
+import sys
+import threading
+import time
+
+from interceptor import Aspects
+from interceptor.caching import default_key
+
+clock = getattr(time, 'monotonic', time.time)  # Python 2 has no monotonic clock
+
+
+class BulkheadFull(RuntimeError):
+    """Raised for a call which couldn't start within the timeout, the method being at its limit"""
+
+
+class _Flight(object):
+    """Call in flight, shared by the identical calls made meanwhile"""
+    __slots__ = ('owner', 'done', 'result', 'error')
+
+    def __init__(self):
+        self.owner = threading.current_thread()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Aspect coalescing concurrent identical calls of a method into a single call.
+
+    Calls made while an identical call is in flight, by key of the call, wait for it and share
+    its result or exception rather than calling the method again. key is called with the
+    instance and arguments of the call to get a hashable key, which by default are the instance
+    and arguments themselves. Calls having an unhashable key, or made by the thread the call in
+    flight is made by, run on their own.
+
+        single_flight = SingleFlight()
+        intercept(single_flight.aspects(r'get_rate'))(ExchangeClient)
+    """
+    def __init__(self, key=default_key):
+        self.key = key
+        self.coalesced = 0
+        self._flights = dict()  # {(MethodInfo, key): _Flight}
+        self._lock = threading.Lock()
+        self.advices = dict(around=self._around)
+
+    def aspects(self, joint_point=r'.*'):
+        """Aspects coalescing calls of the methods matching the joint-point"""
+        return Aspects({joint_point: self.advices})
+
+    def _around(self, join_point):
+        """Wait for the identical call in flight, or make the call sharing it"""
+        try:
+            key = (join_point.method, self.key(
+                join_point.target, *join_point.args, **join_point.kwargs))
+            hash(key)
+        except TypeError:
+            return join_point.proceed()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+            else:
+                leader = False
+                self.coalesced += 1
+        if not leader:
+            if flight.owner is threading.current_thread():
+                return join_point.proceed()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = join_point.proceed()
+            return flight.result
+        except BaseException:
+            flight.error = sys.exc_info()[1]
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class _Slots(object):
+    """Count of calls in flight of a method, bounded by the limit"""
+    __slots__ = ('limit', 'in_flight', 'rejected', 'condition')
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self.condition = threading.Condition(threading.Lock())
+
+    def acquire(self, timeout=None):
+        """Take a slot, waiting for one at most timeout seconds if given. Returns if taken."""
+        with self.condition:
+            if timeout is not None:
+                deadline = clock() + timeout
+            while self.in_flight >= self.limit:
+                if timeout is None:
+                    self.condition.wait()
+                    continue
+                remaining = deadline - clock()
+                if remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self.condition.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        """Give back a slot"""
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+
+class Bulkhead(object):
+    """Aspect limiting calls in flight per method to max_concurrent.
+
+    Calls beyond the limit wait for a call to complete, at most timeout seconds if given, after
+    which they raise BulkheadFull without calling the method.
+
+        bulkhead = Bulkhead(max_concurrent=4, timeout=1)
+        intercept(bulkhead.aspects(r'fetch'))(InventoryClient)
+    """
+    def __init__(self, max_concurrent=10, timeout=None):
+        if max_concurrent < 1:
+            raise ValueError("Calls in flight must be at least 1, not %r" % max_concurrent)
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._slots = dict()  # {MethodInfo: _Slots}
+        self._lock = threading.Lock()
+        self.advices = dict(around=self._around)
+
+    def aspects(self, joint_point=r'.*'):
+        """Aspects limiting calls of the methods matching the joint-point"""
+        return Aspects({joint_point: self.advices})
+
+    def _slots_of(self, method):
+        """Slots of the method, by its MethodInfo, created on its first call"""
+        try:
+            return self._slots[method]
+        except KeyError:
+            with self._lock:
+                return self._slots.setdefault(method, _Slots(self.max_concurrent))
+
+    def _around(self, join_point):
+        """Make the call once a slot is free"""
+        method = join_point.method
+        slots = self._slots_of(method)
+        if not slots.acquire(self.timeout):
+            raise BulkheadFull("%s.%s has %d calls in flight" % (
+                method.cls.__name__, method.name, slots.limit))
+        try:
+            return join_point.proceed()
+        finally:
+            slots.release()
+
+    def snapshot(self):
+        """Calls in flight and calls rejected, per class and method"""
+        return dict((('%s.%s' % (method.cls.__module__, method.cls.__name__), method.name),
+                     dict(in_flight=slots.in_flight, rejected=slots.rejected))
+                    for method, slots in list(self._slots.items()))
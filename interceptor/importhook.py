@@ -0,0 +1,127 @@
+"""Weaving of classes as their modules are imported, by module and class name patterns"""
+
+import inspect
+import re
+import sys
+
+if sys.version_info < (3,):
+    import imp  # Python 3 finds specs instead
+
+from interceptor import Aspects, intercept
+
+
+class _WeavingLoader(object):
+    """Loader weaving the module after the loader it wraps has run it"""
+    def __init__(self, loader, weaver):
+        self.loader = loader
+        self.weaver = weaver
+
+    def create_module(self, spec):
+        """Module created by the loader wrapped, if it creates one"""
+        create_module = getattr(self.loader, 'create_module', None)
+        return create_module(spec) if create_module else None
+
+    def exec_module(self, module):
+        """Run the module and weave its classes"""
+        self.loader.exec_module(module)
+        self.weaver.weave(module)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportWeaver(object):
+    """Finder of sys.meta_path weaving classes of the modules matching rules, as they are imported.
+
+    Modules are found and run by the other finders and loaders, after which classes defined by the
+    module are woven once. Modules never imported are never woven.
+    """
+    def __init__(self):
+        self.rules = list()    # (module regex, class regex, Aspects) in the order added
+        self._loading = set()  # Modules being imported by load_module
+
+    def _rules(self, fullname):
+        """Rules matching the module name"""
+        return [rule for rule in self.rules if rule[0].match(fullname)]
+
+    def weave(self, module, rules=None):
+        """Intercept classes defined in the module with aspects of the rules matching them"""
+        for _, classes, aspects in (self._rules(module.__name__) if rules is None else rules):
+            for obj in list(vars(module).values()):
+                if (inspect.isclass(obj) and obj.__module__ == module.__name__ and
+                        classes.match(obj.__name__)):
+                    intercept(aspects)(obj)
+
+    def find_spec(self, fullname, path=None, target=None):
+        """Spec of the module found by the other finders, with its loader weaving it"""
+        if not self._rules(fullname):
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _WeavingLoader(spec.loader, self)
+        return spec
+
+    def find_module(self, fullname, path=None):
+        """Load the module, when there is one, in Python 2"""
+        if fullname in self._loading or not self._rules(fullname):
+            return None
+        try:
+            # Implicit relative imports look for modules which don't exist.
+            fptr = imp.find_module(fullname.rpartition('.')[2], path)[0]
+        except ImportError:
+            return None
+        if fptr is not None:
+            fptr.close()
+        return self
+
+    def load_module(self, fullname):
+        """Import the module by the other finders and weave it, in Python 2"""
+        if fullname in sys.modules:
+            return sys.modules[fullname]
+        self._loading.add(fullname)
+        try:
+            __import__(fullname)
+        finally:
+            self._loading.discard(fullname)
+        module = sys.modules[fullname]
+        self.weave(module)
+        return module
+
+
+IMPORT_WEAVER = ImportWeaver()
+
+
+def weave_on_import(modules, aspects, classes=r'.*', **options):
+    """Intercept classes matching the pattern, of the modules matching the pattern, on import.
+
+    Patterns are regexes matched at the start of the full name of the module and of the name of
+    the class. Classes of the matching modules imported already are woven right away, and the rest
+    as the modules get imported, hence lazily imported modules are woven only if used. Aspects,
+    or aspects compiled along with the keyword arguments of Aspects, are returned.
+    """
+    if not isinstance(aspects, Aspects):
+        aspects = Aspects(aspects, **options)
+    elif options:
+        raise TypeError("Options of compiled Aspects must be given while compiling them")
+    rule = (re.compile(modules), re.compile(classes), aspects)
+    IMPORT_WEAVER.rules.append(rule)
+    if IMPORT_WEAVER not in sys.meta_path:
+        sys.meta_path.insert(0, IMPORT_WEAVER)
+    for name, module in list(sys.modules.items()):
+        if module is not None and rule[0].match(name):
+            IMPORT_WEAVER.weave(module, [rule])
+    return aspects
+
+
+def stop_weaving_on_import():
+    """Forget the rules and remove the hook, leaving the classes woven as they are"""
+    del IMPORT_WEAVER.rules[:]
+    if IMPORT_WEAVER in sys.meta_path:
+        sys.meta_path.remove(IMPORT_WEAVER)
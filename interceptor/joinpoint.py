@@ -0,0 +1,101 @@
+"""Join point of a call of an intercepted method, and the calls in flight of the current context"""
+
+import inspect
+import threading
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # Python 2, and 3 before 3.7
+    ContextVar = None
+
+
+def _bind(func, args, kwargs):
+    """Arguments of the call bound to the parameters of the function by name, defaults included"""
+    if not hasattr(inspect, 'signature'):  # Python 2
+        return inspect.getcallargs(func, *args, **kwargs)
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+class JoinPoint(object):
+    """Call of an intercepted method, built once per call and passed to every advice of the call.
+
+    It has the instance the method is called on as target, MethodInfo of the method, the
+    positional and keyword arguments, and the result or exception once there is one. item is the
+    item a generator method yielded last. Around advices proceed with the call by proceed. outer
+    is the call in flight the call is made under, if the call is tracked in the context.
+    """
+    __slots__ = ('target', 'method', 'args', 'kwargs', 'result', 'exception', 'item', 'outer',
+                 '_proceed', '_arguments')
+
+    def __init__(self, target, method, args, kwargs):
+        self.target = target
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.result = self.exception = self.item = self.outer = None
+        self._proceed = self._arguments = None
+
+    def snapshot(self):
+        """Copy of the join point as it is now, for an advice run later, which can't proceed"""
+        join_point = JoinPoint(self.target, self.method, self.args, self.kwargs)
+        join_point.result, join_point.exception, join_point.item = (
+            self.result, self.exception, self.item)
+        join_point.outer, join_point._arguments = self.outer, self._arguments
+        return join_point
+
+    def proceed(self):
+        """Proceed with the call to the next around advice, or the method, and get its result.
+
+        Arguments of the join point are the arguments the method is called with.
+        """
+        return self._proceed(self)
+
+    @property
+    def arguments(self):
+        """Arguments of the call by the names of the parameters, bound on first use"""
+        if self._arguments is None:
+            self._arguments = _bind(self.method.func, (self.target,) + tuple(self.args),
+                                    self.kwargs)
+        return self._arguments
+
+    def __repr__(self):
+        return '<JoinPoint %s.%s>' % (self.method.cls.__name__, self.method.name)
+
+
+class _ThreadVar(threading.local):
+    """Context variable of a thread, in absence of context variables"""
+    value = None
+
+    def get(self):
+        """Value of the current thread"""
+        return self.value
+
+    def set(self, value):
+        """Set value of the current thread, and get the token to reset it by"""
+        token, self.value = self.value, value
+        return token
+
+    def reset(self, token):
+        """Set back the value the token was got with"""
+        self.value = token
+
+
+# Innermost call in flight, of the methods woven with context, per thread, and per task of asyncio
+# if context variables exist. Calls in flight are linked by their outer call.
+CURRENT = ContextVar('interceptor_join_point', default=None) if ContextVar else _ThreadVar()
+
+
+def current_join_point(cls=None):
+    """Join point of the innermost call in flight, made on an instance of the class if given.
+
+    Only calls of the methods woven by Aspects compiled with context=True are tracked. Calls
+    found are the ones of the current thread, or asyncio task, and of the process it is forked
+    from. None is returned when there is no such call.
+    """
+    join_point = CURRENT.get()
+    if cls is not None:
+        while join_point is not None and not isinstance(join_point.target, cls):
+            join_point = join_point.outer
+    return join_point
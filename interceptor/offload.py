@@ -0,0 +1,136 @@
+"""Pool of threads running the advices offloaded from the calls, out of their latency"""
+
+import atexit
+import logging
+import os
+import threading
+import weakref
+
+from multiprocessing.util import Finalize, register_after_fork
+
+try:
+    from Queue import Full, Queue
+except ImportError:
+    from queue import Full, Queue  # pylint: disable=F0401
+
+LOG = logging.getLogger(__name__)
+# Pools of the process, started afresh in a forked child, which has none of their threads.
+_POOLS = weakref.WeakSet()
+
+
+def _after_fork():
+    """Start the pools afresh in the forked child"""
+    for pool in list(_POOLS):
+        pool._forked()  # pylint: disable=W0212
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class AdvicePool(object):
+    """Bounded pool of threads running the advices offloaded from the calls.
+
+    At most max_queued advices wait for a thread. When the queue is full, the call offloading an
+    advice blocks until there is room, or drops the advice if drop is true. Threads are started on
+    the first advice offloaded and the advices queued are run before the interpreter exits.
+    Advices offloaded once the pool is shut down, as by calls made at exit, are dropped. A forked
+    child starts the pool afresh, without the advices queued by the parent.
+    """
+    _STOP = object()
+
+    def __init__(self, workers=1, max_queued=1024, drop=False):
+        self.workers = workers
+        self.drop = drop
+        self.dropped = 0
+        self._queue = Queue(max_queued)
+        self._threads = list()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        _POOLS.add(self)
+        if not hasattr(os, 'register_at_fork'):  # Python 2, forking by multiprocessing
+            register_after_fork(self, AdvicePool._forked)
+
+    def _forked(self):
+        """Start afresh in the forked child, which has none of the threads of the parent"""
+        self._queue = Queue(self._queue.maxsize)
+        self._threads = list()
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """Start threads if not yet started, and get whether the pool is running"""
+        with self._lock:
+            if self._shutdown:
+                return False
+            if self._threads:
+                return True
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._work, name='interceptor-advice')
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+            atexit.register(self.shutdown)
+            # Forked workers of multiprocessing exit without running atexit handlers.
+            Finalize(self, AdvicePool.shutdown, args=(self,), exitpriority=10)
+        return True
+
+    def _work(self):
+        """Run advices from the queue till stopped"""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                impl, arg, kw = item
+                impl(*arg, **kw)
+            except Exception:  # pylint: disable=W0703
+                LOG.exception("Offloaded advice failed")
+            finally:
+                self._queue.task_done()
+
+    def submit(self, impl, *arg, **kw):
+        """Queue the advice to be run by a thread of the pool, dropped if the pool is shut down"""
+        if not self._threads and not self._start():
+            self.dropped += 1
+            return
+        try:
+            self._queue.put((impl, arg, kw), not self.drop)
+        except Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait till all the advices queued have run"""
+        self._queue.join()
+
+    def shutdown(self, wait=True):
+        """Stop threads once the advices queued have run. Advices offloaded later are dropped"""
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            threads, self._threads = self._threads, list()
+        for _ in threads:
+            self._queue.put(self._STOP)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+DEFAULT_POOL = AdvicePool()
+
+
+class Offload(object):
+    """Advice to be run by a pool of threads rather than before the method returns.
+
+    Advices running after the method, like notifications, can be offloaded to take them out of the
+    latency of the call. They are passed the same arguments as they would be otherwise, the join
+    point as it is when the advice is offloaded.
+    """
+    __slots__ = ('advice', 'pool')
+
+    def __init__(self, advice, pool=DEFAULT_POOL):
+        self.advice = advice
+        self.pool = pool
+
+    def __call__(self, *arg, **kw):
+        self.pool.submit(self.advice, *arg, **kw)
@@ -0,0 +1,269 @@
+"""Flight recorder aspect keeping the last calls of every thread in a ring, dumped on exception
+
+The dump is decoded offline into lines like the call graph trace:
+
+    python -m interceptor.recorder flight.4242.1.ifr
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import struct
+import threading
+import weakref
+
+from array import array
+from time import time
+
+from interceptor import Aspects
+
+MAGIC = b'IFR1'
+# Kinds of the records, kept in the lowest bits of the mark along with the depth.
+ENTER, EXIT, EXCEPTION = 0, 1, 2
+MARKERS = '><!'
+_KIND_BITS = 2
+_KIND_MASK = (1 << _KIND_BITS) - 1
+
+
+class Ring(object):
+    """Last records of a thread, in arrays fixed and allocated upfront.
+
+    A record is the time, id of the method and the mark, the depth of the call shifted along with
+    the kind of the record.
+    """
+    __slots__ = ('label', 'stamps', 'methods', 'marks', 'next', 'count', 'depth', 'dumped')
+
+    def __init__(self, label, size):
+        self.label = label
+        self.stamps = array('d', [0.0]) * size
+        self.methods = array('i', [0]) * size
+        self.marks = array('i', [0]) * size
+        self.next = 0    # Index of the record to write next, which is the oldest once full
+        self.count = 0   # Records written in all
+        self.depth = 0
+        self.dumped = None  # Exception the ring was dumped for last
+
+    def ordered(self):
+        """Columns of the records kept, oldest first"""
+        size = len(self.stamps)
+        if self.count < size:
+            return self.stamps[:self.count], self.methods[:self.count], self.marks[:self.count]
+        start = self.next
+        return tuple(column[start:] + column[:start]
+                     for column in (self.stamps, self.methods, self.marks))
+
+
+class FlightRecorder(object):
+    """Aspect recording enter, exit and exception of the calls in a ring of every thread.
+
+    A ring keeps the last size records of its thread, so that memory and cost per call are the
+    same however long interception is left on. Rings of the threads gone are dropped as threads
+    come and go. The ring of a thread is dumped to a file in directory on the first after_exc of
+    an exception, if dump_on_exc, till max_dumps files are dumped, and rings of all the threads by
+    dump. Dumps are decoded by load or render.
+
+        recorder = FlightRecorder(directory='/var/tmp')
+        intercept(recorder.aspects(r'.*'))(BankTransaction)
+        ...
+        recorder.dump()
+    """
+    def __init__(self, size=4096, directory='.', dump_on_exc=True, max_dumps=100):
+        if size < 1:
+            raise ValueError("Size of the ring must be at least 1, not %r" % size)
+        self.size = size
+        self.directory = directory
+        self.dump_on_exc = dump_on_exc
+        self.max_dumps = max_dumps
+        self.dumps = list()  # Files dumped
+        self._ids = dict()   # {MethodInfo: id of the method}
+        self._methods = list()  # MethodInfo by id
+        self._rings = list()  # [(weak reference to the thread, ring)], in order of first call
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.advices = dict(before=self._enter, after_exc=self._exc, after_finally=self._exit)
+
+    def aspects(self, joint_point=r'.*'):
+        """Aspects recording calls of the methods matching the joint-point"""
+        return Aspects({joint_point: self.advices})
+
+    def _ring(self):
+        """Ring of the current thread, allocated on its first call"""
+        try:
+            return self._local.ring
+        except AttributeError:
+            thread = threading.current_thread()
+            ring = self._local.ring = Ring('%d:%s' % (os.getpid(), thread.name), self.size)
+            with self._lock:
+                # Threads of pools come and go, so rings of the threads gone are dropped.
+                self._rings = [item for item in self._rings if item[0]() is not None]
+                self._rings.append((weakref.ref(thread), ring))
+            return ring
+
+    def _id(self, method):
+        """Id of the method, by its MethodInfo, assigned on its first call"""
+        try:
+            return self._ids[method]
+        except KeyError:
+            with self._lock:
+                if method not in self._ids:
+                    self._ids[method] = len(self._methods)
+                    self._methods.append(method)
+            return self._ids[method]
+
+    def _record(self, ring, method, kind):
+        """Write the record over the oldest one"""
+        indx = ring.next
+        ring.stamps[indx] = time()
+        ring.methods[indx] = self._id(method)
+        ring.marks[indx] = ring.depth << _KIND_BITS | kind
+        ring.next = indx + 1 if indx + 1 < self.size else 0
+        ring.count += 1
+
+    def _enter(self, join_point):
+        """Record the call, one deeper"""
+        ring = self._ring()
+        self._record(ring, join_point.method, ENTER)
+        ring.depth += 1
+
+    def _exc(self, join_point):
+        """Record the exception, dumping the ring once per exception, unless dumped enough"""
+        ring = self._ring()
+        ring.depth -= 1
+        self._record(ring, join_point.method, EXCEPTION)
+        ring.depth += 1
+        if self.dump_on_exc and ring.dumped is not join_point.exception:
+            ring.dumped = join_point.exception
+            # Errors raised over and over, in a loop, shouldn't fill the disk with dumps.
+            if len(self.dumps) < self.max_dumps:
+                self.dump(rings=[ring])
+
+    def _exit(self, join_point):
+        """Record return of the call, one shallower"""
+        ring = self._ring()
+        ring.depth -= 1
+        self._record(ring, join_point.method, EXIT)
+
+    def dump(self, filename=None, rings=None):
+        """Write the rings, of all the threads unless given, to the file, and get its name"""
+        if filename is None:
+            with self._lock:
+                filename = os.path.join(self.directory, 'flight.%d.%d.ifr' % (
+                    os.getpid(), len(self.dumps) + 1))
+                self.dumps.append(filename)
+        with self._lock:
+            methods = list(self._methods)
+            if rings is None:
+                rings = [ring for thread, ring in self._rings if thread() is not None]
+        with open(filename, 'wb') as fptr:
+            fptr.write(MAGIC)
+            fptr.write(struct.pack('<I', len(methods)))
+            for info in methods:
+                _write_str(fptr, '\t'.join((
+                    info.module, info.cls.__name__, info.name, info.filename,
+                    str(info.first_line), str(info.last_line))))
+            fptr.write(struct.pack('<I', len(rings)))
+            for ring in rings:
+                stamps, ids, marks = ring.ordered()
+                _write_str(fptr, ring.label)
+                fptr.write(struct.pack('<I', len(stamps)))
+                fptr.write(struct.pack('<%dd' % len(stamps), *stamps))
+                fptr.write(struct.pack('<%di' % len(ids), *ids))
+                fptr.write(struct.pack('<%di' % len(marks), *marks))
+        return filename
+
+
+class MethodRecord(object):
+    """Method of a dump"""
+    __slots__ = ('module', 'cls', 'name', 'filename', 'first_line', 'last_line')
+
+    def __init__(self, module, cls, name, filename, first_line, last_line):
+        self.module = module
+        self.cls = cls
+        self.name = name
+        self.filename = filename
+        self.first_line = int(first_line)
+        self.last_line = int(last_line)
+
+
+def _write_str(fptr, text):
+    """Write the text, prefixed by its length"""
+    data = text.encode('utf-8')
+    fptr.write(struct.pack('<I', len(data)))
+    fptr.write(data)
+
+
+def _read(fptr, fmt):
+    """Values of the format read"""
+    return struct.unpack(fmt, fptr.read(struct.calcsize(fmt)))
+
+
+def _read_str(fptr):
+    """Text prefixed by its length"""
+    return fptr.read(_read(fptr, '<I')[0]).decode('utf-8')
+
+
+def load(filename):
+    """List of the label and records of the rings in the dump, a record being the time,
+    MethodRecord, depth and kind.
+    """
+    with open(filename, 'rb') as fptr:
+        if fptr.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s isn't a flight recorder dump" % filename)
+        methods = [MethodRecord(*_read_str(fptr).split('\t'))
+                   for _ in range(_read(fptr, '<I')[0])]
+        rings = list()
+        for _ in range(_read(fptr, '<I')[0]):
+            label = _read_str(fptr)
+            count = _read(fptr, '<I')[0]
+            stamps = _read(fptr, '<%dd' % count)
+            ids = _read(fptr, '<%di' % count)
+            marks = _read(fptr, '<%di' % count)
+            rings.append((label, [
+                (stamp, methods[method], mark >> _KIND_BITS, mark & _KIND_MASK)
+                for stamp, method, mark in zip(stamps, ids, marks)]))
+    return rings
+
+
+def _short(filename):
+    """Basename of the file, along with its directory if it is __init__.py"""
+    dir_path, short = os.path.split(filename)
+    short = short.replace('.py', '')
+    if short == '__init__':
+        short = '%s.%s' % (os.path.basename(dir_path), short)
+    return short
+
+
+def render(filename, _long=False):
+    """Lines of the dump in the manner of the call graph trace, ! marking exceptions.
+
+    Files are referred by module if _long, otherwise by basename. Lines are prefixed with process
+    id and thread name when the dump has more threads than one.
+    """
+    rings = load(filename)
+    lines = list()
+    for label, records in rings:
+        # Depth is relative to the shallowest record kept.
+        least = min([depth for _, _, depth, _ in records] or [0])
+        for _, info, depth, kind in records:
+            line = '%s: %s:%s %s%s' % (
+                (info.module if _long else _short(info.filename)).rjust(50 if _long else 25),
+                str(info.first_line if kind == ENTER else info.last_line).rjust(4),
+                ' |' * (depth - least), MARKERS[kind], info.name)
+            lines.append('[%s] %s' % (label, line) if len(rings) > 1 else line)
+    return lines
+
+
+def main():
+    """Print the dump as call graph trace"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument("dump", help="Filepath of the flight recorder dump")
+    parser.add_argument("-l", "--long", action='store_true', default=False,
+                        help="Refer to files by module rather than basename")
+    args = parser.parse_args()
+    for line in render(args.dump, args.long):
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
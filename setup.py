@@ -31,10 +31,10 @@ setup(
         'Programming Language :: Python :: 2',
         'Programming Language :: Python :: 2.6',
         'Programming Language :: Python :: 2.7',
+        'Programming Language :: Python :: 3',
     ],
     keywords='python interceptor aop call graph tree',
-    packages=find_packages(),
-    py_modules=['interceptor'],
+    packages=find_packages(exclude=['benchmark', 'benchmark.*', 'tests*']),
     install_requires=['ansible>=2.0'],
     entry_points={
         'console_scripts': [
@@ -0,0 +1,41 @@
+"""Sample coroutine concerns, for Python 3.5+ only"""
+
+# pylint: disable=C0111,R0201,W0613
+
+import asyncio
+
+
+class Inventory(object):
+    """Asynchronous inventory implementations"""
+    async def reserve(self, count):
+        await asyncio.sleep(0)
+        return count
+
+    async def release(self, count):
+        await asyncio.sleep(0)
+        raise ValueError(count)
+
+    def audit(self):
+        return 'audited'
+
+
+def recording_advice(calls, label):
+    """Coroutine advice recording when it starts and ends"""
+    async def advice(*arg, **kw):
+        calls.append(('start', label))
+        await asyncio.sleep(0)
+        calls.append(('end', label))
+    return advice
+
+
+def doubling_around(calls):
+    """Coroutine around advice doubling the result of the method"""
+    async def advice(join_point):
+        calls.append('around')
+        return 2 * await join_point.proceed()
+    return advice
+
+
+async def gather(*coroutines):
+    """Results of the coroutines run concurrently in tasks of the running loop"""
+    return await asyncio.gather(*coroutines)
@@ -0,0 +1 @@
+"""Plugin modules imported lazily by the tests"""
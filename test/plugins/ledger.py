@@ -0,0 +1,8 @@
+"""Plugin imported before weaving on import"""
+
+# pylint: disable=C0111,R0201
+
+
+class BankTransaction(object):
+    def transfer(self, amt):
+        return amt
@@ -1,19 +1,21 @@
 """Sample bank transaction implementation"""
 
+from __future__ import print_function
+
 # pylint: disable=C0111,R0201
 
 
 class BankTransaction(object):
     """Bank transaction implementations"""
     def transfer(self, amt):
-        print "Transferring Rs. %d" % amt
+        print("Transferring Rs. %d" % amt)
 
     def credit(self, amt):
-        print "Adding Rs. %d to account balance" % amt
+        print("Adding Rs. %d to account balance" % amt)
 
     @staticmethod
     def update_passbook():
-        print "Updated passbook"
+        print("Updated passbook")
 
 
 class FoodPreparation(object):
@@ -25,7 +27,7 @@ class FoodPreparation(object):
 
     @classmethod
     def get_dish_count(cls):
-        print "There are %d items" % cls.dish_count
+        print("There are %d items" % cls.dish_count)
 
     def prepare_chapati(self, count):
-        print "%d chapatis ready" % count
+        print("%d chapatis ready" % count)
@@ -0,0 +1,80 @@
+"""Test suite for the memoization aspect"""
+
+import unittest
+
+from interceptor import intercept
+from interceptor import caching
+from interceptor.caching import Memoizer
+
+
+class MemoizerTest(unittest.TestCase):
+    """Memoization aspect"""
+    def setUp(self):
+        self.calls = calls = list()
+
+        class Rates(object):  # pylint: disable=C0111,R0201
+            def get_rate(self, currency, **kw):
+                calls.append(currency)
+                return len(currency)
+
+            def fail(self, currency):
+                calls.append(currency)
+                raise ValueError(currency)
+
+        self.cls = Rates
+
+    def memoize(self, **kw):
+        """Instance of the class memoized"""
+        memoizer = Memoizer(**kw)
+        intercept(memoizer.aspects())(self.cls)
+        return memoizer, self.cls()
+
+    def stats(self, memoizer, name='get_rate'):
+        """Snapshot of the method"""
+        return dict((method, stats) for (_, method), stats in memoizer.snapshot().items())[name]
+
+    def test_hits(self):
+        """Method should be skipped for the calls cached, and unhashable calls not cached"""
+        memoizer, obj = self.memoize()
+        self.assertEqual([obj.get_rate('usd'), obj.get_rate('usd'), obj.get_rate('eur')], [3] * 3)
+        obj.get_rate('usd', at=[1])
+        obj.get_rate('usd', at=[1])
+        self.assertEqual(self.calls, ['usd', 'eur', 'usd', 'usd'])
+        self.assertEqual(self.stats(memoizer),
+                         dict(size=2, hits=1, misses=4, evictions=0))
+
+    def test_lru(self):
+        """Least recently used result should be evicted beyond the size"""
+        memoizer, obj = self.memoize(max_size=2)
+        for currency in ('usd', 'eur', 'usd', 'inr', 'usd', 'eur'):
+            obj.get_rate(currency)
+        self.assertEqual(self.calls, ['usd', 'eur', 'inr', 'eur'])
+        self.assertEqual(self.stats(memoizer)['evictions'], 2)
+
+    def test_ttl(self):
+        """Results should expire after ttl"""
+        now = [100.0]
+        clock, caching.clock = caching.clock, lambda: now[0]
+        try:
+            _, obj = self.memoize(ttl=10, key=lambda _self, currency: currency)
+            obj.get_rate('usd')
+            now[0] += 5
+            obj.get_rate('usd')
+            now[0] += 10
+            obj.get_rate('usd')
+        finally:
+            caching.clock = clock
+        self.assertEqual(self.calls, ['usd', 'usd'])
+
+    def test_exception(self):
+        """Exceptions should not be cached"""
+        memoizer, obj = self.memoize()
+        for _ in range(2):
+            self.assertRaises(ValueError, obj.fail, 'usd')
+        self.assertEqual(self.calls, ['usd', 'usd'])
+        memoizer.clear()
+        self.assertEqual(self.stats(memoizer, 'fail')['size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,271 @@
+"""Test suite for the call graph traces, text and binary, their analysis and the call tree"""
+
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from example.call_graph.aggregate import CallTree
+from example.call_graph.analyze import Method, analyze
+from example.call_graph.binary import (
+    ENTER, EXIT, HEADER, MAGIC, RECORD, BinaryTraceSink, _pack_str, read_header)
+from example.call_graph.sink import TraceSink
+from interceptor import intercept
+
+DEPOSIT = Method('/bank/account.py', 10, 14, 'deposit')
+WITHDRAW = Method('/bank/account.py', 16, 20, 'withdraw')
+
+
+def _write(sink, records):
+    """Write the records to the sink"""
+    for record in records:
+        sink.write(record)
+
+
+class TraceSinkTest(unittest.TestCase):
+    """Text trace sink merging its parts"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'trace.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        """Lines of the trace, as label and record"""
+        with open(self.filename) as fptr:
+            return [tuple(line.rstrip('\n').split(' ', 1)) for line in fptr]
+
+    def test_single(self):
+        """Records of the only thread should be written as they are"""
+        with TraceSink(self.filename) as sink:
+            _write(sink, ['>deposit\n', '<deposit\n'])
+        with open(self.filename) as fptr:
+            self.assertEqual(fptr.read(), '>deposit\n<deposit\n')
+        self.assertEqual(os.listdir(self.directory), ['trace.txt'])
+
+    def test_merge(self):
+        """Parts of the threads and workers should be merged by time, prefixed by their labels"""
+        sink = TraceSink(self.filename)
+        _write(sink, ['>deposit\n', '<deposit\n'])
+        thread = threading.Thread(target=_write, args=(sink, ['>withdraw\n']), name='teller')
+        thread.start()
+        thread.join()
+        workers = list()
+        for _ in range(2):
+            workers.append(multiprocessing.Process(target=_write, args=(sink, ['>audit\n'])))
+            workers[-1].start()
+            workers[-1].join()
+        sink.close()
+        self.assertEqual(self.read(), [
+            ('[%d:MainThread]' % os.getpid(), '>deposit'),
+            ('[%d:MainThread]' % os.getpid(), '<deposit'),
+            ('[%d:teller]' % os.getpid(), '>withdraw'),
+            ('[%d:MainThread]' % workers[0].pid, '>audit'),
+            ('[%d:MainThread]' % workers[1].pid, '>audit')])
+
+    def test_merge_runs(self):
+        """Parts more than the files open at once should be merged by time in runs"""
+        sink = TraceSink(self.filename)
+        sink.max_open = 2
+        for indx in range(7):
+            thread = threading.Thread(target=_write, args=(sink, ['%d\n' % indx]),
+                                      name='teller-%d' % indx)
+            thread.start()
+            thread.join()
+        sink.close()
+        self.assertEqual(self.read(), [('[%d:teller-%d]' % (os.getpid(), indx), str(indx))
+                                       for indx in range(7)])
+
+
+class BinaryTraceSinkTest(unittest.TestCase):
+    """Binary trace sink merging its parts"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'trace.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_merge(self):
+        """Parts of the threads and workers should be merged by time, sharing the methods"""
+        for max_open in (BinaryTraceSink.max_open, 2):
+            self.merge(max_open)
+
+    def merge(self, max_open):
+        """Merge parts of a thread and a worker besides the main thread, max_open at a time"""
+        sink = BinaryTraceSink(self.filename)
+        sink.max_open = max_open
+        _write(sink, [(DEPOSIT, 0, ENTER), (DEPOSIT, 0, EXIT)])
+        thread = threading.Thread(target=_write, args=(sink, [(WITHDRAW, 0, ENTER)]),
+                                  name='teller')
+        thread.start()
+        thread.join()
+        worker = multiprocessing.Process(target=_write, args=(
+            sink, [(WITHDRAW, 0, ENTER), (DEPOSIT, 1, ENTER), (DEPOSIT, 1, EXIT)]))
+        worker.start()
+        worker.join()
+        sink.close()
+        with open(self.filename, 'rb') as fptr:
+            data = fptr.read()
+        methods, labels, offset, count = read_header(data)
+        self.assertEqual(sorted(methods), sorted([tuple(DEPOSIT), tuple(WITHDRAW)]))
+        self.assertEqual(sorted(label.split(':', 1)[0] for label in labels),
+                         sorted([str(os.getpid())] * 2 + [str(worker.pid)]))
+        self.assertEqual(count, 6)
+        records = [RECORD.unpack_from(data, offset + indx * RECORD.size) for indx in range(count)]
+        self.assertEqual(len(data), offset + count * RECORD.size)
+        stamps = [stamp for stamp, _, _, _, _ in records]
+        self.assertEqual(stamps, sorted(stamps))
+        self.assertEqual([(methods[method][3], labels[stream].split(':', 1)[1], depth, kind)
+                          for _, method, stream, depth, kind in records], [
+                              ('deposit', 'MainThread', 0, ENTER),
+                              ('deposit', 'MainThread', 0, EXIT),
+                              ('withdraw', 'teller', 0, ENTER),
+                              ('withdraw', 'MainThread', 0, ENTER),
+                              ('deposit', 'MainThread', 1, ENTER),
+                              ('deposit', 'MainThread', 1, EXIT)])
+
+
+class AnalyzeTest(unittest.TestCase):
+    """Analysis of the binary trace in chunks"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'trace.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def trace(self, records, methods=(DEPOSIT, WITHDRAW), labels=('1:MainThread',)):
+        """Write the trace of the records, as time, method, stream, depth and kind"""
+        with open(self.filename, 'wb') as fptr:
+            fptr.write(HEADER.pack(MAGIC, len(methods), len(labels), len(records)))
+            for text in ['\t'.join(str(field) for field in method) for method in methods]:
+                fptr.write(_pack_str(text))
+            for label in labels:
+                fptr.write(_pack_str(label))
+            for record in records:
+                fptr.write(RECORD.pack(*record))
+
+    def test_pair_across_chunks(self):
+        """Calls should be timed alike however the trace is chunked, even if taking no time"""
+        self.trace([(1.0, 0, 0, 0, ENTER), (2.0, 1, 0, 1, ENTER), (2.0, 1, 0, 1, EXIT),
+                    (5.0, 0, 0, 0, EXIT), (6.0, 1, 0, 0, ENTER), (6.5, 1, 0, 0, EXIT)])
+        expected = {DEPOSIT: (1, 4.0, 4.0), WITHDRAW: (2, 0.5, 0.5)}
+        for chunk in (1, 2, 3, 6):
+            for jobs in (1, 2):
+                stats, depths = analyze(self.filename, jobs=jobs, chunk=chunk)
+                self.assertEqual(stats, expected, (chunk, jobs))
+                self.assertEqual(depths, {0: 2, 1: 1})
+
+    def test_streams(self):
+        """Calls should be paired per stream, beyond the streams of two bytes"""
+        self.trace([(1.0, 0, 0, 0, ENTER), (2.0, 0, 70000, 0, ENTER), (4.0, 0, 0, 0, EXIT),
+                    (8.0, 0, 70000, 0, EXIT)])
+        stats, _ = analyze(self.filename, jobs=1, chunk=1)
+        self.assertEqual(stats, {DEPOSIT: (2, 9.0, 6.0)})
+
+    def test_tree(self):
+        """Text call graph should be the same however the trace is chunked"""
+        self.trace([(1.0, 0, 0, 0, ENTER), (2.0, 1, 1, 1, ENTER), (3.0, 1, 1, 1, EXIT),
+                    (4.0, 0, 0, 0, EXIT)], labels=('1:MainThread', '1:teller'))
+        trees = list()
+        for chunk in (1, 4):
+            tree = io.StringIO()
+            analyze(self.filename, tree, jobs=1, chunk=chunk)
+            trees.append(tree.getvalue())
+        self.assertEqual(trees[0], trees[1])
+        self.assertEqual([line.rsplit(':', 1)[1] for line in trees[0].splitlines()], [
+            ' >deposit', ' | >withdraw', ' | <withdraw', ' <deposit'])
+        self.assertTrue(trees[0].splitlines()[1].startswith('[1:teller] '))
+
+
+class CallTreeTest(unittest.TestCase):
+    """Call tree aggregating calls by path"""
+    def setUp(self):
+        class Teller(object):  # pylint: disable=C0111,R0201
+            def serve(self):
+                self.deposit()
+                self.deposit()
+
+            def deposit(self):
+                time.sleep(0.002)
+
+            def count(self, num):
+                time.sleep(0.0005)
+                if num:
+                    self.count(num - 1)
+
+        self.tree = CallTree()
+        self.teller = intercept(self.tree.aspects())(Teller)()
+        self.serve, self.deposit, self.count = ('test_call_graph:Teller.%s' % name
+                                                for name in ('serve', 'deposit', 'count'))
+
+    def tearDown(self):
+        self.tree.close()
+
+    def test_rows(self):
+        """Calls should be counted by path, with their time less the time of the calls they make
+        as self time
+        """
+        self.teller.serve()
+        self.teller.deposit()
+        rows = self.tree.rows()
+        self.assertEqual(sorted((path, stats[0]) for path, stats in rows.items()), [
+            ((self.deposit, ), 1), ((self.serve, ), 1), ((self.serve, self.deposit), 2)])
+        calls, total, own = rows[self.serve, ]
+        self.assertEqual(own, total - rows[self.serve, self.deposit][1])
+        calls, total, own = rows[self.serve, self.deposit]
+        self.assertEqual(own, total)
+        self.assertTrue(total >= calls * 2000000)
+
+    def test_collapsed(self):
+        """Collapsed stacks should be written by self time in microseconds"""
+        self.teller.serve()
+        lines = self.tree.collapsed()
+        self.assertEqual([line.rsplit(' ', 1)[0] for line in lines],
+                         [self.serve, ';'.join((self.serve, self.deposit))])
+        self.assertTrue(int(lines[1].rsplit(' ', 1)[1]) >= 4000)
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'call_graph.folded')
+            self.tree.write_collapsed(filename)
+            with open(filename) as fptr:
+                self.assertEqual(fptr.read().splitlines(), lines)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_hot_methods(self):
+        """Methods should be ordered by self time, counting time of recursive calls once"""
+        self.teller.count(2)
+        self.teller.serve()
+        hot = self.tree.hot_methods()
+        self.assertEqual(sorted((label, calls) for label, calls, _, _ in hot),
+                         [(self.count, 3), (self.deposit, 2), (self.serve, 1)])
+        owns = [own for _, _, _, own in hot]
+        self.assertEqual(owns, sorted(owns, reverse=True))
+        rows = self.tree.rows()
+        count = [row for row in hot if row[0] == self.count][0]
+        self.assertEqual(count[2], rows[self.count, ][1])
+        self.assertEqual(count[3], sum(own for path, (_, _, own) in rows.items()
+                                       if path[-1] == self.count))
+        lines = self.tree.format_hot(limit=2).splitlines()
+        self.assertEqual(lines[0].split(), ['calls', 'total', 'ms', 'self', 'ms', 'method'])
+        self.assertEqual([line.split()[-1] for line in lines[1:]], [row[0] for row in hot[:2]])
+
+    def test_worker(self):
+        """Calls of a forked worker should be merged into the calls of the process creating it"""
+        self.teller.serve()
+        worker = multiprocessing.Process(target=self.teller.serve)
+        worker.start()
+        worker.join()
+        self.assertEqual(sorted((path, stats[0]) for path, stats in self.tree.rows().items()),
+                         [((self.serve, ), 2), ((self.serve, self.deposit), 4)])
+
+
+if __name__ == '__main__':
+    unittest.main()
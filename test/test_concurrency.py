@@ -0,0 +1,95 @@
+"""Test suite for the single-flight and bulkhead aspects"""
+
+import threading
+import time
+import unittest
+
+from interceptor import intercept
+from interceptor.concurrency import Bulkhead, BulkheadFull, SingleFlight
+
+
+class Slow(object):  # pylint: disable=C0111,R0201
+    """Methods blocking till released"""
+    def __init__(self):
+        self.calls = list()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def fetch(self, item):
+        self.calls.append(item)
+        self.entered.set()
+        self.release.wait(5)
+        if item == 'missing':
+            raise KeyError(item)
+        return [item]
+
+
+def wait_for(condition):
+    """Wait till the condition is true, at most a few seconds"""
+    deadline = time.time() + 5
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+
+
+class SingleFlightTest(unittest.TestCase):
+    """Coalescing concurrent identical calls"""
+    def setUp(self):
+        self.single_flight = SingleFlight(key=lambda _self, item: item)
+        self.obj = intercept(self.single_flight.aspects(r'fetch'))(type('Slow', (Slow,), dict()))()
+        self.results = list()
+
+    def call(self, item):
+        """Call recording the result or the exception"""
+        try:
+            self.results.append(self.obj.fetch(item))
+        except KeyError as exc:
+            self.results.append(exc)
+
+    def coalesce(self, item, count=3):
+        """Make concurrent identical calls, the first one in flight when the rest are made"""
+        threads = [threading.Thread(target=self.call, args=(item,)) for _ in range(count)]
+        threads[0].start()
+        self.obj.entered.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        wait_for(lambda: self.single_flight.coalesced == count - 1)
+        self.obj.release.set()
+        for thread in threads:
+            thread.join()
+
+    def test_result_shared(self):
+        """Identical calls in flight should share the result of a single call"""
+        self.coalesce('apple')
+        self.assertEqual(self.obj.calls, ['apple'])
+        self.assertEqual(len(self.results), 3)
+        self.assertTrue(all(result is self.results[0] for result in self.results))
+        self.obj.fetch('apple')
+        self.assertEqual(self.obj.calls, ['apple', 'apple'])
+
+    def test_exception_shared(self):
+        """Identical calls in flight should share the exception of a single call"""
+        self.coalesce('missing')
+        self.assertEqual(self.obj.calls, ['missing'])
+        self.assertTrue(all(isinstance(result, KeyError) for result in self.results))
+
+
+class BulkheadTest(unittest.TestCase):
+    """Limiting calls in flight"""
+    def test_limit(self):
+        """Calls beyond the limit should wait at most timeout, and then be rejected"""
+        bulkhead = Bulkhead(max_concurrent=1, timeout=0.05)
+        obj = intercept(bulkhead.aspects(r'fetch'))(type('Slow', (Slow,), dict()))()
+        thread = threading.Thread(target=obj.fetch, args=('apple',))
+        thread.start()
+        obj.entered.wait(5)
+        self.assertRaises(BulkheadFull, obj.fetch, 'pear')
+        self.assertEqual(list(bulkhead.snapshot().values()), [dict(in_flight=1, rejected=1)])
+        obj.release.set()
+        thread.join()
+        self.assertEqual(obj.fetch('pear'), ['pear'])
+        self.assertEqual(obj.calls, ['apple', 'pear'])
+        self.assertEqual(list(bulkhead.snapshot().values()), [dict(in_flight=0, rejected=1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
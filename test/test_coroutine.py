@@ -0,0 +1,79 @@
+"""Test suite for interception of coroutine methods"""
+
+import unittest
+
+try:
+    import asyncio
+    from test.coroutine_concerns import Inventory, doubling_around, gather, recording_advice
+except (ImportError, SyntaxError):  # Python 3.5+ only
+    asyncio = None
+
+from interceptor import current_join_point, intercept
+from interceptor.joinpoint import ContextVar
+
+
+@unittest.skipIf(asyncio is None, "Coroutines need Python 3.5+")
+class CoroutineTest(unittest.TestCase):
+    """Coroutine methods intercepted"""
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.calls = list()
+        self.cls = type('Inventory', (Inventory,), dict())
+
+    def tearDown(self):
+        self.loop.close()
+
+    def record(self, label, attr='result'):
+        """Advice recording the value of the join point it is passed"""
+        return lambda jp: self.calls.append((label, getattr(jp, attr)))
+
+    def test_after_completion(self):
+        """After advices should be run once the coroutine completes, with its result"""
+        intercept({r'reserve': dict(
+            before=self.record('before'),
+            after_success=self.record('after_success'),
+            after_finally=self.record('after_finally'))})(self.cls)
+        self.assertTrue(asyncio.iscoroutinefunction(self.cls.reserve))
+        coroutine = self.cls().reserve(3)
+        self.assertEqual(self.calls, list())
+        self.assertEqual(self.loop.run_until_complete(coroutine), 3)
+        self.assertEqual(self.calls, [
+            ('before', None), ('after_success', 3), ('after_finally', 3)])
+
+    def test_exception(self):
+        """Exception raised while awaited should be passed to after_exc and re-raised"""
+        intercept({r'release': dict(after_exc=self.record('after_exc', 'exception'))})(self.cls)
+        self.assertRaises(ValueError, self.loop.run_until_complete, self.cls().release(2))
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(isinstance(self.calls[0][1], ValueError))
+
+    def test_concurrent_advices(self):
+        """Coroutine advices of an advice should be awaited concurrently"""
+        intercept({r'reserve': dict(before=(
+            recording_advice(self.calls, 1), recording_advice(self.calls, 2)))})(self.cls)
+        self.loop.run_until_complete(self.cls().reserve(1))
+        self.assertEqual([event for event, _ in self.calls], ['start', 'start', 'end', 'end'])
+
+    def test_coroutine_advice_on_method(self):
+        """Coroutine advice can't advise a method that isn't a coroutine"""
+        self.assertRaises(TypeError, intercept({r'audit': dict(
+            before=recording_advice(self.calls, 1))}), self.cls)
+
+    def test_around(self):
+        """Coroutine around advice should await the method, and sync around be refused"""
+        intercept({r'reserve': dict(around=doubling_around(self.calls))})(self.cls)
+        self.assertEqual(self.loop.run_until_complete(self.cls().reserve(3)), 6)
+        self.assertEqual(self.calls, ['around'])
+        self.assertRaises(TypeError, intercept({r'release': dict(
+            around=lambda jp: jp.proceed())}),
+                          self.cls)
+
+    @unittest.skipIf(ContextVar is None, "Context of asyncio tasks needs Python 3.7+")
+    def test_context(self):
+        """Join point should be current in the task awaiting the call only"""
+        intercept({r'reserve': dict(after_success=lambda jp: self.calls.append(
+            current_join_point() is jp))}, context=True)(self.cls)
+        obj = self.cls()
+        self.loop.run_until_complete(gather(obj.reserve(1), obj.reserve(2)))
+        self.assertEqual(self.calls, [True, True])
+        self.assertEqual(current_join_point(), None)
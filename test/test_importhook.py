@@ -0,0 +1,55 @@
+"""Test suite for weaving on import"""
+
+import sys
+import unittest
+
+from interceptor import unintercept
+from interceptor.importhook import IMPORT_WEAVER, stop_weaving_on_import, weave_on_import
+
+
+class ImportWeaverTest(unittest.TestCase):
+    """Weaving classes of modules matching patterns as they are imported"""
+    def setUp(self):
+        self.calls = list()
+        self.aspects = {r'transfer': dict(before=lambda jp: self.calls.append(jp.method))}
+        sys.modules.pop('test.plugins.transfer', None)
+
+    def tearDown(self):
+        stop_weaving_on_import()
+        module = sys.modules.pop('test.plugins.transfer', None)
+        if module is not None:
+            del sys.modules['test.plugins'].transfer
+
+    def test_weave_on_import(self):
+        """Matching classes of a module should be woven once it is imported"""
+        weave_on_import(r'test\.plugins\.transfer$', self.aspects, classes=r'Bank')
+        self.assertTrue(IMPORT_WEAVER in sys.meta_path)
+        self.assertFalse('test.plugins.transfer' in sys.modules)
+        from test.plugins.transfer import BankTransaction, Ledger
+        self.assertEqual(BankTransaction().transfer(5), 5)
+        self.assertEqual(Ledger().transfer(5), 5)
+        self.assertEqual([info.cls for info in self.calls], [BankTransaction])
+
+    def test_imported_already(self):
+        """Classes of a matching module imported already should be woven right away"""
+        from test.plugins.ledger import BankTransaction
+        weave_on_import(r'test\.plugins\.ledger', self.aspects)
+        try:
+            BankTransaction().transfer(5)
+            self.assertEqual(len(self.calls), 1)
+        finally:
+            unintercept(BankTransaction)
+
+    def test_other_modules(self):
+        """Modules not matching should be imported as they are, and the hook removed on stop"""
+        weave_on_import(r'test\.plugins\.ledger', self.aspects)
+        from test.plugins.transfer import BankTransaction
+        BankTransaction().transfer(5)
+        self.assertEqual(self.calls, [])
+        stop_weaving_on_import()
+        self.assertFalse(IMPORT_WEAVER in sys.meta_path)
+        self.assertEqual(IMPORT_WEAVER.rules, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
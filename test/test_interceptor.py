@@ -1,11 +1,21 @@
 """Test suite for interceptor"""
 
+import multiprocessing
+import re
 import sys
+import threading
 import unittest
 
-from StringIO import StringIO
+from collections import OrderedDict
 
-from interceptor import intercept
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from interceptor import (
+    AdvicePool, Aspects, MethodInfo, Offload, Pointcut, current_join_point, disable, enable,
+    intercept, unintercept)
 from test.advices import BankAdvices, CookingAdvices
 from test.primary_concerns import BankTransaction, FoodPreparation
 
@@ -29,7 +39,7 @@ class NonInterceptedTest(CapturePrints):
         """Should generate non-intercepted output"""
         obj = NonInterceptedBankTransaction()
         obj.transfer(1000)
-        self.assertEquals(sys.stdout.getvalue().strip(), "Transferring Rs. 1000")
+        self.assertEqual(sys.stdout.getvalue().strip(), "Transferring Rs. 1000")
 
 
 class InterceptedTest(CapturePrints):
@@ -64,7 +74,7 @@ class InterceptedTest(CapturePrints):
             "Transaction successful"
         ])
         self.bank_obj.credit(1000)
-        self.assertEquals(sys.stdout.getvalue().strip(), expected_out)
+        self.assertEqual(sys.stdout.getvalue().strip(), expected_out)
 
     def test_method_priority(self):
         """Conflicting advice should resolve to joint-point same as method name over wildcard"""
@@ -74,12 +84,12 @@ class InterceptedTest(CapturePrints):
             "Transaction successful"
         ])
         self.bank_obj.transfer(1000)
-        self.assertEquals(sys.stdout.getvalue().strip(), expected_out)
+        self.assertEqual(sys.stdout.getvalue().strip(), expected_out)
 
     def test_staticmethod(self):
         """Staticmethod don't work now"""
         self.bank_obj.update_passbook()
-        self.assertEquals(sys.stdout.getvalue().strip(), "Updated passbook")
+        self.assertEqual(sys.stdout.getvalue().strip(), "Updated passbook")
 
     def test_multiple_advices(self):
         """All implementations for the same advice should apply. Exception must be re-raised"""
@@ -89,7 +99,7 @@ class InterceptedTest(CapturePrints):
             "Ingredients not ready"
         ])
         self.assertRaises(Exception, self.cook_obj.prepare_curry)
-        self.assertEquals(sys.stdout.getvalue().strip(), expected_out)
+        self.assertEqual(sys.stdout.getvalue().strip(), expected_out)
 
     @unittest.skip('Feature removed temporarily')
     def test_classmethod(self):
@@ -99,12 +109,753 @@ class InterceptedTest(CapturePrints):
             "There are 3 items"
         ])
         self.cook_obj.get_dish_count()
-        self.assertEquals(sys.stdout.getvalue().strip(), expected_out)
+        self.assertEqual(sys.stdout.getvalue().strip(), expected_out)
 
     def test_no_matching_method(self):
         """Method not advised should behave normally"""
         self.cook_obj.prepare_chapati(4)
-        self.assertEquals(sys.stdout.getvalue().strip(), "4 chapatis ready")
+        self.assertEqual(sys.stdout.getvalue().strip(), "4 chapatis ready")
+
+
+class WrapperTest(unittest.TestCase):
+    """Wrapper generated at weave time"""
+    def test_return_value_to_advices(self):
+        """Return value should reach after advices and the caller"""
+        calls = []
+
+        class Sample(object):  # pylint: disable=C0111,R0201
+            def compute(self, num):
+                return num * 2
+
+        intercept({r'compute': dict(
+            around_after=lambda jp: calls.append(('around_after', jp.result)),
+            after_finally=lambda jp: calls.append(('after_finally', jp.result)))})(Sample)
+        self.assertEqual(Sample().compute(2), 4)
+        self.assertEqual(calls, [('around_after', 4), ('after_finally', 4)])
+
+    def test_exception_reraised_intact(self):
+        """Exception should be re-raised even if after_exc advice handles another exception"""
+        def swallow(*arg, **kw):  # pylint: disable=W0613
+            try:
+                raise KeyError
+            except KeyError:
+                pass
+
+        class Sample(object):  # pylint: disable=C0111,R0201
+            def fail(self):
+                raise ValueError("fail")
+
+        intercept({r'fail': dict(after_exc=swallow)})(Sample)
+        self.assertRaises(ValueError, Sample().fail)
+
+    def test_method_info(self):
+        """Advices should be passed metadata of the method, standing in for the method"""
+        infos = list()
+
+        class Sample(object):  # pylint: disable=C0111,R0201
+            def run(self, num):
+                num += 1
+                return num
+
+        first_line = Sample.__dict__['run'].__code__.co_firstlineno
+        intercept({r'run': dict(before=lambda jp: infos.append(jp.method))})(Sample)
+        obj = Sample()
+        obj.run(1)
+        obj.run(2)
+        info = infos[0]
+        self.assertTrue(isinstance(info, MethodInfo) and info is infos[1])
+        self.assertEqual((info.cls, info.name, info.module, info.first_line, info.last_line),
+                         (Sample, 'run', __name__, first_line, first_line + 2))
+        self.assertEqual(info.filename, info.__code__.co_filename)
+        self.assertEqual(info(obj, 1), 2)
+
+    def test_only_existing_advices(self):
+        """Wrapper of a method having only before advice shouldn't handle exceptions"""
+        class Sample(object):  # pylint: disable=C0111,R0201
+            def run(self):
+                pass
+
+        intercept({r'run': dict(before=BankAdvices.start_transaction_log)})(Sample)
+        code = Sample.__dict__['run'].__code__
+        self.assertEqual(code.co_name, 'trivial')
+        self.assertNotIn('exc_info', code.co_varnames)
+        self.assertEqual(Sample.run.__name__, 'run')
+
+
+class StreamTest(unittest.TestCase):
+    """Generator methods intercepted"""
+    def setUp(self):
+        self.calls = calls = list()
+
+        class Sample(object):  # pylint: disable=C0111,R0201
+            def numbers(self, count):
+                for num in range(count):
+                    if num < 0:
+                        raise ValueError(num)
+                    yield num
+
+            def echo(self):
+                sent = yield
+                while True:
+                    sent = yield sent * 2
+
+        attr = dict(after_yield='item', after_exc='exception').get
+        record = lambda label: lambda jp: calls.append((label, getattr(jp, attr(label, 'result'))))
+        intercept({r'.*': dict(
+            before=record('before'), after_yield=record('after_yield'),
+            after_exc=record('after_exc'), after_success=record('after_success'),
+            after_finally=record('after_finally'))})(Sample)
+        self.obj = Sample()
+
+    def test_lazy(self):
+        """Advices should run while the items are passed through"""
+        numbers = self.obj.numbers(2)
+        self.assertEqual(self.calls, list())
+        self.assertEqual(next(numbers), 0)
+        self.assertEqual(self.calls, [('before', None), ('after_yield', 0)])
+        self.assertEqual(list(numbers), [1])
+        self.assertEqual(self.calls[2:], [
+            ('after_yield', 1), ('after_success', None), ('after_finally', None)])
+
+    def test_exception(self):
+        """Exception raised while iterating should be passed to after_exc"""
+        numbers = self.obj.numbers(2)
+        next(numbers)
+        self.assertRaises(KeyError, numbers.throw, KeyError)
+        self.assertEqual([label for label, _ in self.calls],
+                         ['before', 'after_yield', 'after_exc', 'after_finally'])
+
+    def test_close(self):
+        """Closing the generator should run after_finally only"""
+        echo = self.obj.echo()
+        next(echo)
+        self.assertEqual(echo.send(2), 4)
+        echo.close()
+        self.assertEqual([label for label, _ in self.calls],
+                         ['before', 'after_yield', 'after_yield', 'after_finally'])
+
+    def test_unstarted(self):
+        """Advices of a generator never iterated shouldn't run"""
+        self.obj.numbers(2).close()
+        self.assertEqual(self.calls, list())
+
+
+class AspectsTest(unittest.TestCase):
+    """Compiled joint-point matching"""
+    JOINT_POINTS = (r'transfer', r'\bcredit\b', r'^debit$', r'.*', r'tr.*r', r'^(?!_read$)_.*',
+                    r'(?i)CREDIT', r'(c)r\1?edit', r'update_')
+
+    def test_same_as_regex(self):
+        """Joint-points should match the names re.match matches"""
+        aspects = Aspects(OrderedDict((joint_point, dict(before=indx))
+                                      for indx, joint_point in enumerate(self.JOINT_POINTS)))
+        for name in ('transfer', 'transfers', 'credit', 'credits', 'debit', 'debits', '_read',
+                     '_reader', 'update_passbook', 'update', 'counter'):
+            expected = set(indx for indx, joint_point in enumerate(self.JOINT_POINTS)
+                           if re.match(joint_point, name))
+            self.assertEqual(set(aspects._matching(name)), expected, name)
+
+    def test_many_joint_points(self):
+        """Joint-points should match beyond the groups a regex can have"""
+        aspects = Aspects(dict((r'method_%d(?!\d)' % indx, dict(before=indx))
+                               for indx in range(150)))
+        self.assertEqual(aspects.match('method_120'), dict(before=(120,)))
+        self.assertEqual(aspects.match('method_12'), dict(before=(12,)))
+
+    def test_exact_priority(self):
+        """Advice of exactly matching joint-point should be preferred, else the first given"""
+        aspects = Aspects(OrderedDict([
+            (r'.*', dict(before=1, after_success=1)),
+            (r'cr.*', dict(before=2, after_exc=2)),
+            (r'\bcredit\b', dict(after_success=3))]))
+        self.assertEqual(aspects.match('credit'),
+                          dict(before=(1,), after_success=(3,), after_exc=(2,)))
+        self.assertEqual(aspects.match('create'),
+                          dict(before=(1,), after_success=(1,), after_exc=(2,)))
+
+    def test_shared_across_classes(self):
+        """Advices of a name should be resolved once for all the classes woven"""
+        aspects = Aspects({r'transfer': dict(before=BankAdvices.start_transaction_log)})
+        resolved = list()
+        matching = aspects._matching
+        aspects._matching = lambda name: resolved.append(name) or matching(name)
+        for cls in (NonInterceptedBankTransaction, BankTransaction):
+            intercept(aspects)(type('Clone', (cls,), dict()))
+        self.assertEqual(resolved.count('transfer'), 1)
+
+
+class SwitchTest(unittest.TestCase):
+    """Swapping woven methods with their originals"""
+    def setUp(self):
+        self.calls = calls = list()
+
+        class Base(object):  # pylint: disable=C0111,R0201
+            def inherited(self):
+                return 'inherited'
+
+        class Sample(Base):  # pylint: disable=C0111,R0201
+            def own(self):
+                return 'own'
+
+        self.cls, self.own = Sample, Sample.__dict__['own']
+        self.aspects = Aspects({r'.*': dict(before=lambda jp: calls.append(jp.method))})
+        intercept(self.aspects)(Sample)
+
+    def tearDown(self):
+        enable()
+
+    def assert_original(self):
+        """Class should have the methods as before weaving"""
+        self.assertTrue(self.cls.__dict__['own'] is self.own)
+        self.assertNotIn('inherited', self.cls.__dict__)
+        self.cls().own()
+        self.assertEqual(self.calls, list())
+
+    def test_unintercept(self):
+        """Original methods should be restored"""
+        self.assertTrue(self.cls.__dict__['own'].__wrapped__ is self.own)
+        unintercept(self.cls)
+        self.assert_original()
+
+    def test_disable_aspects(self):
+        """Aspects disabled should swap in originals, enabled again should swap in wrappers"""
+        disable(self.aspects)
+        self.assert_original()
+        enable(self.aspects)
+        self.assertEqual(self.cls().inherited(), 'inherited')
+        self.assertEqual(len(self.calls), 1)
+
+    def test_disable_mapping(self):
+        """Aspects should be switched by the mapping they are intercepted with"""
+        class Other(object):  # pylint: disable=C0111,R0201
+            def own(self):
+                return 'own'
+
+        own, calls = Other.__dict__['own'], self.calls
+        advices = {r'own': dict(before=lambda jp: calls.append(jp.method))}
+        intercept(advices)(Other)
+        disable(advices)
+        self.assertTrue(Other.__dict__['own'] is own)
+        enable(dict(advices))
+        Other().own()
+        self.assertEqual(len(self.calls), 1)
+        self.assertRaises(TypeError, disable, [advices])
+
+    def test_disable_all(self):
+        """All the aspects disabled should swap in originals, even of the aspects enabled"""
+        disable()
+        enable(self.aspects)
+        self.assert_original()
+
+
+class LazyTest(unittest.TestCase):
+    """Weaving methods on their first access"""
+    def setUp(self):
+        self.calls = calls = list()
+
+        class Base(object):  # pylint: disable=C0111,R0201
+            def inherited(self):
+                return 'inherited'
+
+        class Sample(Base):  # pylint: disable=C0111,R0201
+            def own(self):
+                return self.inherited()
+
+        self.cls, self.own = Sample, Sample.__dict__['own']
+        self.aspects = Aspects({r'own': dict(before=lambda jp: calls.append(jp.method.name))})
+        intercept(self.aspects, lazy=True)(Sample)
+
+    def test_first_access(self):
+        """Methods should be woven on first access only, and those not matching restored"""
+        self.assertFalse(callable(self.cls.__dict__['own']))
+        self.assertEqual(self.cls().own(), 'inherited')
+        self.assertTrue(self.cls.__dict__['own'].__wrapped__ is self.own)
+        self.assertNotIn('inherited', self.cls.__dict__)
+        self.cls().own()
+        self.assertEqual(self.calls, ['own', 'own'])
+
+    def test_layers(self):
+        """Lazy interception of a class woven should add to the weaving once accessed"""
+        intercept({r'.*': dict(before=lambda *arg, **kw: self.calls.append('all'))},
+                  lazy=True)(self.cls)
+        self.cls().own()
+        self.assertEqual(self.calls, ['all', 'own', 'all'])
+
+    def test_super(self):
+        """Method accessed first by super() should be of the class, not of the subclass"""
+        class Sub(self.cls):  # pylint: disable=C0111,R0201
+            def own(self):
+                return 'sub+' + super(Sub, self).own()
+
+        self.assertEqual(Sub().own(), 'sub+inherited')
+        self.assertEqual(Sub().own(), 'sub+inherited')
+        self.assertEqual(self.calls, ['own', 'own'])
+
+    def test_unintercept(self):
+        """Methods should be restored whether woven or not yet"""
+        self.cls().inherited()
+        unintercept(self.cls)
+        self.assertTrue(self.cls.__dict__['own'] is self.own)
+        self.assertNotIn('inherited', self.cls.__dict__)
+        self.cls().own()
+        self.assertEqual(self.calls, list())
+
+
+class FlattenTest(unittest.TestCase):
+    """Weaving aspects once and flattening them into a single wrapper"""
+    def setUp(self):
+        self.calls = list()
+
+        class Base(object):  # pylint: disable=C0111,R0201
+            def run(self):
+                return 'run'
+
+        class Sample(Base):
+            pass
+
+        self.base, self.cls, self.run = Base, Sample, Base.__dict__['run']
+        self.aspects = self.make_aspects('base')
+
+    def make_aspects(self, label):
+        """Aspects recording the advices run, along with the label"""
+        calls = self.calls
+        return Aspects({r'run': dict(
+            before=lambda jp: calls.append((label, 'before', jp.method.cls.__name__)),
+            after_success=lambda jp: calls.append((label, 'after', jp.method.cls.__name__)))})
+
+    def test_idempotent(self):
+        """Aspects woven again should neither wrap again nor advise again"""
+        intercept(self.aspects)(self.base)
+        wrapper = self.base.__dict__['run']
+        intercept(self.aspects)(self.base)
+        intercept(self.aspects)(self.cls)
+        self.assertTrue(self.base.__dict__['run'] is wrapper)
+        self.assertNotIn('run', self.cls.__dict__)
+        self.cls().run()
+        self.assertEqual(self.calls, [('base', 'before', 'Base'), ('base', 'after', 'Base')])
+
+    def test_idempotent_mapping(self):
+        """Plain mapping of the same advices woven again should not advise again"""
+        calls = self.calls
+        advices = {r'run': dict(before=lambda jp: calls.append(jp.method.cls.__name__))}
+        intercept(advices)(self.base)
+        intercept(dict(advices))(self.base)
+        intercept(advices)(self.cls)
+        self.cls().run()
+        self.assertEqual(self.calls, ['Base'])
+        intercept(advices, one_in=1)(self.base)
+        self.base().run()
+        self.assertEqual(self.calls, ['Base', 'Base', 'Base'])
+
+    def test_sample_per_intercept(self):
+        """Classes intercepted with the same mapping should sample their calls on their own"""
+        calls = self.calls
+        advices = {r'run': dict(before=lambda jp: calls.append(jp.method.cls.__name__))}
+        other = type('Other', (object,), dict(run=self.run))
+        intercept(advices, one_in=2)(self.base)
+        intercept(advices, one_in=2)(other)
+        for _ in range(2):
+            self.base().run()
+            other().run()
+        self.assertEqual(self.calls, ['Base', 'Other'])
+
+    def test_flattened(self):
+        """Aspects added should be flattened into a single wrapper, the latest outermost"""
+        intercept(self.aspects)(self.base)
+        intercept(self.make_aspects('more'))(self.base)
+        self.assertTrue(self.base.__dict__['run'].__wrapped__ is self.run)
+        self.base().run()
+        self.assertEqual([call[:2] for call in self.calls], [
+            ('more', 'before'), ('base', 'before'), ('base', 'after'), ('more', 'after')])
+
+    def test_inherited(self):
+        """Subclass should flatten aspects woven into the base class with its own, once"""
+        intercept(self.aspects)(self.base)
+        intercept(self.make_aspects('sub'))(self.cls)
+        self.assertTrue(self.cls.__dict__['run'].__wrapped__ is self.run)
+        self.cls().run()
+        self.assertEqual(self.calls, [
+            ('sub', 'before', 'Sample'), ('base', 'before', 'Sample'),
+            ('base', 'after', 'Sample'), ('sub', 'after', 'Sample')])
+        del self.calls[:]
+        unintercept(self.base)
+        self.cls().run()
+        self.assertEqual(self.calls, [('sub', 'before', 'Sample'), ('sub', 'after', 'Sample')])
+        unintercept(self.cls)
+
+
+class PointcutTest(unittest.TestCase):
+    """Joint-points filtering classes and calls"""
+    def setUp(self):
+        self.calls = list()
+        self.checks = list()
+
+        class Account(object):  # pylint: disable=C0111,R0201
+            def deposit(self, amt):
+                return amt
+
+        class Savings(Account):  # pylint: disable=C0111
+            pass
+
+        self.base, self.cls = Account, Savings
+
+    def record(self, label):
+        """Advice recording the label"""
+        return lambda *arg, **kw: self.calls.append(label)
+
+    def large(self, _self, amt):
+        """Predicate of the calls depositing large amounts"""
+        self.checks.append(amt)
+        return amt > 100
+
+    def test_within(self):
+        """Advices should be woven into the subclasses of the classes filtered only"""
+        aspects = Aspects({Pointcut(r'deposit', within=self.cls): dict(before=self.record('in'))})
+        intercept(aspects)(self.base)
+        self.assertFalse(hasattr(self.base.__dict__['deposit'], '__wrapped__'))
+        intercept(aspects)(self.cls)
+        self.base().deposit(1)
+        self.cls().deposit(1)
+        self.assertEqual(self.calls, ['in'])
+
+    def test_when(self):
+        """Advices should run only for the calls the predicate returns true for, checked once"""
+        intercept({Pointcut(r'deposit', when=self.large): dict(
+            before=self.record('before'), after_success=self.record('after'))})(self.base)
+        self.assertEqual(self.base().deposit(1), 1)
+        self.assertEqual(self.base().deposit(500), 500)
+        self.assertEqual(self.calls, ['before', 'after'])
+        self.assertEqual(self.checks, [1, 500])
+
+    def test_when_mixed(self):
+        """Advices without predicate should run for every call"""
+        intercept(OrderedDict([
+            (Pointcut(r'deposit', when=self.large), dict(before=self.record('large'))),
+            (r'deposit', dict(around_before=self.record('any'),
+                              after_finally=self.record('done'))),
+        ]))(self.base)
+        self.base().deposit(1)
+        self.base().deposit(500)
+        self.assertEqual(self.calls, ['any', 'done', 'large', 'any', 'done'])
+        self.assertEqual(self.checks, [1, 500])
+
+    def test_when_around(self):
+        """Predicate of around advices should be checked once per call, however many are guarded"""
+        plus = lambda jp: jp.proceed() + 1
+        legacy_plus = lambda _self, method, proceed, *arg, **kw: proceed(_self, *arg, **kw) + 1
+        for legacy, advice in ((False, plus), (True, legacy_plus)):
+            class Account(self.base):  # pylint: disable=C0111
+                pass
+
+            intercept(OrderedDict([
+                (Pointcut(r'deposit', when=self.large), dict(around=(advice, advice))),
+                (r'deposit', dict(before=self.record('any'))),
+            ]), legacy=legacy)(Account)
+            del self.checks[:]
+            self.assertEqual(Account().deposit(500), 502)
+            self.assertEqual(Account().deposit(1), 1)
+            self.assertEqual(self.checks, [500, 1])
+
+
+class AroundTest(unittest.TestCase):
+    """Around advices replacing the call of the method"""
+    def setUp(self):
+        self.calls = calls = list()
+
+        class Account(object):  # pylint: disable=C0111,R0201
+            def balance(self, amt):
+                calls.append('balance')
+                return amt
+
+        self.cls = Account
+
+    def around(self, label, result=None):
+        """Around advice returning the result if given, or proceeding to the method"""
+        def advice(jp):
+            self.calls.append(label)
+            return result if result is not None else jp.proceed() + 1
+        return advice
+
+    def test_chain(self):
+        """Around advices should be chained outermost first, and after advices get their result"""
+        intercept({r'balance': dict(
+            around=(self.around('outer'), self.around('inner')),
+            after_success=lambda jp: self.calls.append(jp.result))})(self.cls)
+        self.assertEqual(self.cls().balance(1), 3)
+        self.assertEqual(self.calls, ['outer', 'inner', 'balance', 3])
+
+    def test_short_circuit(self):
+        """Around advice should be able to skip the method"""
+        intercept({r'balance': dict(around=(self.around('outer'), self.around('cached', 10)))})(
+            self.cls)
+        self.assertEqual(self.cls().balance(1), 11)
+        self.assertEqual(self.calls, ['outer', 'cached'])
+
+    def test_generator(self):
+        """Around advice should be refused for generator methods"""
+        class Statement(object):  # pylint: disable=C0111,R0201
+            def entries(self):
+                yield 1
+
+        self.assertRaises(TypeError, intercept({r'entries': dict(around=self.around('no'))}),
+                          Statement)
+
+
+class JoinPointTest(unittest.TestCase):
+    """Join point of a call passed to its advices"""
+    def setUp(self):
+        self.calls = calls = list()
+
+        class Account(object):  # pylint: disable=C0111,R0201
+            def transfer(self, amt, to='savings', fee=0):
+                calls.append(('transfer', amt))
+                if amt < 0:
+                    raise ValueError(amt)
+                return amt - fee
+
+        self.cls = Account
+
+    def test_shared(self):
+        """Advices of a call should be passed the same join point, having the call"""
+        points = list()
+        intercept({r'transfer': dict(before=points.append, after_success=points.append)})(
+            self.cls)
+        obj = self.cls()
+        self.assertEqual(obj.transfer(5, fee=1), 4)
+        self.assertTrue(points[0] is points[1])
+        point = points[0]
+        self.assertEqual((point.target, point.method.name, point.args, point.kwargs),
+                         (obj, 'transfer', (5,), dict(fee=1)))
+        self.assertEqual((point.result, point.exception), (4, None))
+        self.assertEqual(point.arguments, dict(self=obj, amt=5, to='savings', fee=1))
+        obj.transfer(2)
+        self.assertFalse(points[2] is point)
+
+    def test_exception(self):
+        """Join point should have the exception of the call"""
+        points = list()
+        intercept({r'transfer': dict(after_exc=points.append)})(self.cls)
+        self.assertRaises(ValueError, self.cls().transfer, -1)
+        self.assertTrue(isinstance(points[0].exception, ValueError))
+
+    def test_proceed_again(self):
+        """Around advice should be able to proceed with the call more than once"""
+        def retry(jp):
+            try:
+                return jp.proceed()
+            except ValueError:
+                jp.args = (-jp.args[0],)
+                return jp.proceed()
+
+        intercept({r'transfer': dict(around=(retry, lambda jp: jp.proceed() * 2))})(self.cls)
+        self.assertEqual(self.cls().transfer(-3), 6)
+        self.assertEqual(self.calls, [('transfer', -3), ('transfer', 3)])
+
+    def test_legacy(self):
+        """Legacy aspects should pass the instance, method info, value and arguments"""
+        def around(obj, method, proceed, *arg, **kw):
+            self.calls.append(('around', method.name))
+            return proceed(obj, *arg, **kw)
+
+        intercept({r'transfer': dict(
+            around=around,
+            after_success=lambda *arg, **kw: self.calls.append(('after', arg[2:], kw)))},
+                  legacy=True)(self.cls)
+        intercept({r'transfer': dict(before=lambda jp: self.calls.append(('jp', jp.args)))})(
+            self.cls)
+        self.assertEqual(self.cls().transfer(5, fee=1), 4)
+        self.assertEqual(self.calls, [
+            ('jp', (5,)), ('around', 'transfer'), ('transfer', 5),
+            ('after', (4, 5), dict(fee=1))])
+
+
+class ContextTest(unittest.TestCase):
+    """Calls in flight tracked as current join points"""
+    def setUp(self):
+        self.calls = calls = list()
+
+        class Task(object):  # pylint: disable=C0111,R0201
+            def execute(self, fail=False):
+                calls.append(current_join_point(Worker))
+                if fail:
+                    raise ValueError
+                thread = threading.Thread(target=lambda: calls.append(current_join_point()))
+                thread.start()
+                thread.join()
+                return current_join_point()
+
+        class Worker(object):  # pylint: disable=C0111,R0201
+            def run(self, fail=False):
+                return Task().execute(fail)
+
+        self.task, self.worker = Task, Worker
+        self.aspects = Aspects({Pointcut(r'run', within=Worker): dict()}, context=True)
+        intercept(self.aspects)(Worker)
+
+    def test_outer_calls(self):
+        """Innermost call in flight, and of an instance of a class, should be found"""
+        self.assertTrue(self.worker.__dict__['run'].__wrapped__)
+        points = list()
+        intercept({r'execute': dict(before=points.append)}, context=True)(self.task)
+        worker = self.worker()
+        point = worker.run()
+        self.assertTrue(point is points[0])
+        self.assertTrue(point.outer.target is worker and point.outer.method.name == 'run')
+        self.assertTrue(self.calls[0] is point.outer)
+        self.assertEqual(current_join_point(), None)
+
+    def test_threads(self):
+        """Calls of a thread shouldn't be current in the other threads"""
+        self.worker().run()
+        self.assertEqual(self.calls[0].method.name, 'run')
+        self.assertEqual(self.calls[1], None)
+
+    def test_exception(self):
+        """Calls should leave the context once they raise"""
+        self.assertRaises(ValueError, self.worker().run, True)
+        self.assertEqual(self.calls[0].method.name, 'run')
+        self.assertEqual(current_join_point(), None)
+
+    def test_legacy(self):
+        """Calls of legacy aspects should be tracked as well, and none without context"""
+        intercept({r'execute': dict(after_success=lambda *arg, **kw: self.calls.append(arg[2]))},
+                  legacy=True, context=True)(self.task)
+        self.worker().run()
+        self.assertEqual(self.calls[2].method.name, 'execute')
+        self.assertTrue(self.calls[2].outer is self.calls[0])
+        unintercept(self.worker)
+        intercept({r'run': dict(before=lambda jp: None)})(self.worker)
+        self.worker().run()
+        self.assertEqual(self.calls[3], None)
+
+
+class SamplingTest(unittest.TestCase):
+    """Advices run for a sample of calls"""
+    def sampled_calls(self, count, **sampling):
+        """Call a method woven with the sampling, and get the advices run"""
+        calls = list()
+
+        class Sample(object):  # pylint: disable=C0111,R0201
+            def run(self, indx):
+                return indx
+
+        intercept({r'run': dict(
+            before=lambda jp: calls.append(('before', jp.args[0])),
+            after_finally=lambda jp: calls.append(('after_finally', jp.args[0])))},
+                  **sampling)(Sample)
+        obj = Sample()
+        self.assertEqual([obj.run(indx) for indx in range(count)], list(range(count)))
+        return calls
+
+    def test_one_in(self):
+        """Every nth call should be sampled, with all of its advices"""
+        self.assertEqual(self.sampled_calls(7, one_in=3), [
+            ('before', 0), ('after_finally', 0), ('before', 3), ('after_finally', 3),
+            ('before', 6), ('after_finally', 6)])
+
+    def test_probability(self):
+        """Calls should be sampled by probability"""
+        self.assertEqual(self.sampled_calls(10, probability=0), list())
+        self.assertEqual(len(self.sampled_calls(10, probability=1)), 20)
+
+    def test_per_second(self):
+        """At most the given calls should be sampled in a second"""
+        self.assertEqual(self.sampled_calls(10, per_second=2), [
+            ('before', 0), ('after_finally', 0), ('before', 1), ('after_finally', 1)])
+
+    def test_invalid(self):
+        """Sampling should be one of the options, given while compiling aspects"""
+        self.assertRaises(ValueError, self.sampled_calls, 1, one_in=2, probability=0.5)
+        self.assertRaises(TypeError, intercept, Aspects(dict()), one_in=2)
+
+
+class OffloadTest(unittest.TestCase):
+    """Advices offloaded to a pool of threads"""
+    def setUp(self):
+        self.pool = AdvicePool(workers=2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_offload(self):
+        """Offloaded advice should run in a thread of the pool with the same arguments"""
+        calls = list()
+
+        class Sample(object):  # pylint: disable=C0111,R0201
+            def run(self, num):
+                return num + 1
+
+        advice = lambda jp: calls.append(
+            (threading.current_thread().name, jp.result, jp.args, jp.kwargs))
+        intercept({r'run': dict(after_success=Offload(advice, self.pool))})(Sample)
+        self.assertEqual(Sample().run(1, **dict()), 2)
+        self.pool.flush()
+        self.assertEqual(calls, [('interceptor-advice', 2, (1,), dict())])
+
+    def test_drop(self):
+        """Advices should be dropped when the queue is full, if so asked"""
+        pool, event = AdvicePool(max_queued=1, drop=True), threading.Event()
+        for _ in range(3):
+            pool.submit(event.wait)
+        event.set()
+        pool.shutdown()
+        self.assertTrue(pool.dropped >= 1)
+
+    def test_shut_down(self):
+        """Advices offloaded once the pool is shut down should be dropped, not fail the call"""
+        calls = list()
+
+        class Sample(object):  # pylint: disable=C0111,R0201
+            def run(self):
+                return 'run'
+
+        intercept({r'run': dict(after_success=Offload(calls.append, self.pool))})(Sample)
+        self.pool.shutdown()
+        self.assertEqual(Sample().run(), 'run')
+        self.assertEqual((calls, self.pool.dropped), (list(), 1))
+
+    def test_snapshot(self):
+        """Offloaded advice should be passed the join point as it was when offloaded"""
+        calls, event = list(), threading.Event()
+
+        class Sample(object):  # pylint: disable=C0111,R0201
+            def run(self):
+                return 'run'
+
+        def change(join_point):  # pylint: disable=C0111
+            join_point.result = 'changed'
+
+        self.pool.submit(event.wait)
+        intercept({r'run': dict(after_success=(Offload(lambda jp: calls.append(jp.result),
+                                                       self.pool), change))})(Sample)
+        Sample().run()
+        event.set()
+        self.pool.flush()
+        self.assertEqual(calls, ['run'])
+
+    def test_fork(self):
+        """Pool should be started afresh in a forked child, rather than queue for no thread"""
+        pool, calls = AdvicePool(max_queued=2), list()
+        pool.submit(calls.append, 'parent')
+        pool.flush()
+
+        def child():  # pylint: disable=C0111
+            for indx in range(3):
+                pool.submit(calls.append, indx)
+            pool.flush()
+            sys.exit(0 if calls == ['parent', 0, 1, 2] else 1)
+
+        process = multiprocessing.Process(target=child)
+        process.start()
+        process.join(10)
+        if process.is_alive():
+            process.terminate()
+        pool.shutdown()
+        self.assertEqual(process.exitcode, 0)
+
+    def test_before_not_offloaded(self):
+        """Advices before the method can't be offloaded"""
+        self.assertRaises(ValueError, Aspects, {r'run': dict(before=Offload(len, self.pool))})
 
 
 if __name__ == '__main__':
@@ -0,0 +1,71 @@
+"""Test suite for the profiling aspect"""
+
+import json
+import unittest
+
+from interceptor import intercept
+from interceptor.profiling import Histogram, Profiler
+
+
+class HistogramTest(unittest.TestCase):
+    """Latency histogram"""
+    def test_percentile(self):
+        """Percentile should be the highest latency of its bucket, within an 8th of it"""
+        histogram = Histogram()
+        for value in range(1, 1001):
+            histogram.record(value * 1000)
+        self.assertEqual(histogram.count(), 1000)
+        for percent, value in ((50, 500000), (99, 990000)):
+            self.assertTrue(value <= histogram.percentile(percent) <= value * 1.125)
+        self.assertEqual(histogram.percentile(100), histogram.buckets()[-1][0])
+
+    def test_bounds(self):
+        """Latencies beyond the buckets should be in the first or the last bucket"""
+        histogram = Histogram()
+        histogram.record(-1)
+        histogram.record(1 << 50)
+        self.assertEqual([indx for indx, count in enumerate(histogram.counts) if count],
+                         [0, Histogram.SIZE - 1])
+        histogram.reset()
+        self.assertEqual(histogram.percentile(50), None)
+
+
+class ProfilerTest(unittest.TestCase):
+    """Profiling aspect"""
+    def setUp(self):
+        class Account(object):  # pylint: disable=C0111,R0201
+            def deposit(self, amt):
+                return amt
+
+            def withdraw(self, amt):
+                raise ValueError(amt)
+
+        self.profiler = Profiler()
+        self.cls = intercept(self.profiler.aspects())(Account)
+
+    def test_snapshot(self):
+        """Calls and errors should be counted per class and method"""
+        obj = self.cls()
+        for amt in range(3):
+            obj.deposit(amt)
+        self.assertRaises(ValueError, obj.withdraw, 1)
+        snapshot = dict((name, stats) for (_, name), stats in self.profiler.snapshot().items())
+        self.assertEqual(sorted(snapshot), ['deposit', 'withdraw'])
+        self.assertEqual((snapshot['deposit']['calls'], snapshot['deposit']['errors']), (3, 0))
+        self.assertEqual((snapshot['withdraw']['calls'], snapshot['withdraw']['errors']), (1, 1))
+        self.assertTrue(snapshot['deposit']['p50_ns'] <= snapshot['deposit']['p99_ns'])
+        self.assertTrue(list(self.profiler.snapshot())[0][0].endswith('Account'))
+
+    def test_export_reset(self):
+        """Export should be JSON serializable and reset should forget the calls"""
+        self.cls().deposit(1)
+        exported = json.loads(json.dumps(self.profiler.export()))
+        self.assertEqual([
+            (item['method'], item['calls'], sum(count for _, count in item['buckets']))
+            for item in exported], [('deposit', 1, 1)])
+        self.profiler.reset()
+        self.assertEqual(self.profiler.snapshot()[(exported[0]['cls'], 'deposit')]['calls'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Test suite for the flight recorder aspect"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from interceptor import intercept
+from interceptor.recorder import ENTER, EXCEPTION, EXIT, FlightRecorder, load, render
+
+
+def _run_thread(target, *args):
+    """Run the target in a thread, and wait for it"""
+    thread = threading.Thread(target=target, args=args)
+    thread.start()
+    thread.join()
+
+
+class FlightRecorderTest(unittest.TestCase):
+    """Flight recorder aspect"""
+    def setUp(self):
+        class Account(object):  # pylint: disable=C0111,R0201
+            def transfer(self, amt):
+                self.withdraw(amt)
+                return amt
+
+            def withdraw(self, amt):
+                if amt < 0:
+                    raise ValueError(amt)
+                return amt
+
+        self.directory = tempfile.mkdtemp()
+        self.cls = Account
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def recorder(self, **kwargs):
+        """Recorder recording calls of the class"""
+        recorder = FlightRecorder(directory=self.directory, **kwargs)
+        intercept(recorder.aspects())(self.cls)
+        return recorder
+
+    def test_last_records(self):
+        """Ring should keep the last records only, oldest first"""
+        recorder = self.recorder(size=5)
+        self.cls().transfer(1)
+        self.cls().withdraw(2)
+        (label, records), = load(recorder.dump())
+        self.assertEqual(label, '%d:%s' % (os.getpid(), threading.current_thread().name))
+        self.assertEqual([(info.name, depth, kind) for _, info, depth, kind in records], [
+            ('withdraw', 1, ENTER), ('withdraw', 1, EXIT), ('transfer', 0, EXIT),
+            ('withdraw', 0, ENTER), ('withdraw', 0, EXIT)])
+        stamps = [stamp for stamp, _, _, _ in records]
+        self.assertEqual(stamps, sorted(stamps))
+
+    def test_dump_on_exc(self):
+        """Ring should be dumped once for an exception raised through calls"""
+        recorder = self.recorder()
+        self.assertRaises(ValueError, self.cls().transfer, -1)
+        self.assertEqual(len(recorder.dumps), 1)
+        (_, records), = load(recorder.dumps[0])
+        self.assertEqual([(info.name, depth, kind) for _, info, depth, kind in records], [
+            ('transfer', 0, ENTER), ('withdraw', 1, ENTER), ('withdraw', 1, EXCEPTION)])
+        self.assertRaises(ValueError, self.cls().withdraw, -1)
+        self.assertEqual(len(recorder.dumps), 2)
+
+    def test_max_dumps(self):
+        """Rings shouldn't be dumped on exception once max_dumps files are dumped"""
+        recorder = self.recorder(max_dumps=2)
+        for _ in range(3):
+            self.assertRaises(ValueError, self.cls().withdraw, -1)
+        self.assertEqual(len(recorder.dumps), 2)
+        recorder.dump()
+        self.assertEqual(len(recorder.dumps), 3)
+
+    def test_threads_gone(self):
+        """Rings of the threads gone should be dropped"""
+        recorder = self.recorder()
+        self.cls().withdraw(1)
+        for _ in range(10):
+            _run_thread(self.cls().withdraw, 1)
+        self.assertTrue(len(recorder._rings) <= 2)  # pylint: disable=W0212
+        self.assertEqual([label for label, _ in load(recorder.dump())],
+                         ['%d:%s' % (os.getpid(), threading.current_thread().name)])
+
+    def test_render(self):
+        """Dump should render like the call graph trace, prefixed by thread if many"""
+        recorder = self.recorder(dump_on_exc=False)
+        self.assertRaises(ValueError, self.cls().transfer, -1)
+        self.assertEqual(recorder.dumps, list())
+        first_line = self.cls.__dict__['transfer'].__wrapped__.__code__.co_firstlineno
+        lines = render(recorder.dump())
+        self.assertEqual([line.split(':', 1)[0].strip() for line in lines], ['test_recorder'] * 6)
+        self.assertEqual([line.split(':', 2)[2] for line in lines], [
+            ' >transfer', ' | >withdraw', ' | !withdraw', ' | <withdraw', ' !transfer',
+            ' <transfer'])
+        self.assertEqual(int(lines[0].split(':')[1]), first_line)
+        thread = threading.Thread(target=self.cls().withdraw, args=(1,), name='teller')
+        thread.start()
+        thread.join()
+        lines = render(recorder.dump())
+        self.assertEqual(len(lines), 8)
+        self.assertTrue(lines[-1].startswith('[%d:teller] ' % os.getpid()))
+
+
+if __name__ == '__main__':
+    unittest.main()